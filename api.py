@@ -0,0 +1,259 @@
+"""Headless JSON API over the dashboard's aggregates.
+
+Serves the summary metrics, state counts, Top postcodes/suburbs and the
+monthly series with growth figures for the same filters as the sidebar,
+from the same background-refreshed data state and query backends as
+app.py (a SQL backend gets a database file of its own per process),
+without running the Streamlit script. Responses are kept per
+(data version, endpoint, filters) and carry an ETag, so a repeated request
+is answered from memory and a client that sends If-None-Match gets a 304.
+
+Endpoints (GET): /api/version, /api/summary, /api/states,
+/api/top/postcodes, /api/top/suburbs, /api/monthly, /api/monthly/states
+
+Filters (query string): state and postcode (repeated or comma-separated),
+near (depot name or postcode) with radius_km, start and end (YYYY-MM-DD),
+order_id with match; the Top endpoints also take k (default 10).
+
+Usage: python api.py [--host 127.0.0.1] [--port 8502]
+
+Binding to a host other than loopback needs a bearer token (API_TOKEN in
+config.py); clients send it as "Authorization: Bearer <token>".
+"""
+import argparse
+import hashlib
+import hmac
+import ipaddress
+import json
+import logging
+import threading
+from collections import OrderedDict
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+
+from config import API_CACHE_SIZE, API_HOST, API_PORT, API_TOKEN, DEPOTS
+from datastate import data_refresher, query_backend, selection_filters
+from growth import growth_table
+from loader import DataError
+from postcodes import POSTCODE_SLOTS
+from search import MATCH_MODES
+from topk import TOP_K_CHOICES, top_k
+
+# Largest k the Top endpoints accept
+MAX_TOP_K = 1000
+
+logger = logging.getLogger(__name__)
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def records(frame):
+    """JSON-ready rows of a frame, with monthly Periods as "YYYY-MM" and Categoricals as labels."""
+    frame = frame.copy()
+    for col in frame.columns:
+        if isinstance(frame[col].dtype, pd.PeriodDtype):
+            frame[col] = frame[col].dt.strftime('%Y-%m')
+    return json.loads(frame.to_json(orient='records', date_format='iso'))
+
+
+def summary(view):
+    total = view.total()
+    state_counts = view.state_counts()
+    mom = growth_table(view.monthly_counts())
+    top_count = int(state_counts['OrderCount'].iloc[0]) if not state_counts.empty else 0
+    return {
+        'total_orders': total,
+        'top_state': str(state_counts['State'].iloc[0]) if not state_counts.empty else None,
+        'top_state_pct': top_count / total * 100 if total > 0 else 0.0,
+        'latest_mom_pct': float(mom['MoM_Change'].iloc[-1]) if len(mom) > 1 else 0.0,
+    }
+
+
+def top_suburbs(view, postcodes, k):
+    return top_k(postcodes.suburb_counts(view.postcode_counts()), k)
+
+
+def monthly(view):
+    return growth_table(view.monthly_counts())
+
+
+def state_monthly(view):
+    return growth_table(view.state_monthly_counts(), by='State')
+
+
+class ResponseCache:
+    """LRU cache of encoded responses keyed by data version, endpoint and filters."""
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.responses = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            response = self.responses.get(key)
+            if response is not None:
+                self.responses.move_to_end(key)
+            return response
+
+    def put(self, key, response):
+        with self.lock:
+            self.responses[key] = response
+            while len(self.responses) > self.maxsize:
+                self.responses.popitem(last=False)
+
+
+class OrdersApi:
+    """Routes API requests to the current data state; independent of the HTTP server."""
+
+    def __init__(self, refresher, cache_size=API_CACHE_SIZE, token=API_TOKEN):
+        self.refresher = refresher
+        self.cache = ResponseCache(cache_size)
+        self.token = token
+
+    def filters(self, state, query):
+        def values(name):
+            return [part.strip() for value in query.get(name, []) for part in value.split(',') if part.strip()]
+
+        def one(name, default=None):
+            found = query.get(name)
+            return found[-1] if found else default
+
+        try:
+            postcode_keys = [int(postcode) for postcode in values('postcode')]
+            near = one('near')
+            near_postcode = DEPOTS[near] if near in DEPOTS else int(near) if near is not None else None
+            radius_km = float(one('radius_km', 25))
+            start_date = date.fromisoformat(one('start')) if one('start') else None
+            end_date = date.fromisoformat(one('end')) if one('end') else None
+        except ValueError as e:
+            raise ApiError(400, f"Invalid filter: {e}") from e
+        if near_postcode is not None and not 0 <= near_postcode < POSTCODE_SLOTS:
+            raise ApiError(400, f"near must be a depot name or a postcode: {near}")
+        order_id_mode = one('match', MATCH_MODES[0])
+        if order_id_mode not in MATCH_MODES:
+            raise ApiError(400, f"match must be one of: {', '.join(MATCH_MODES)}")
+        return selection_filters(
+            state, sorted(set(values('state'))), postcode_keys, near_postcode, radius_km,
+            start_date, end_date, one('order_id', ''), order_id_mode
+        )
+
+    def top_k(self, query):
+        try:
+            k = int(query.get('k', [TOP_K_CHOICES[0]])[-1])
+        except ValueError:
+            k = 0
+        if not 1 <= k <= MAX_TOP_K:
+            raise ApiError(400, f"k must be a whole number from 1 to {MAX_TOP_K}")
+        return k
+
+    def payload(self, path, state, filters, k):
+        """The JSON-ready body for an endpoint, or None if there is no such endpoint."""
+        if path == '/api/version':
+            return {'version': state.version, 'orders': len(state.df)}
+        view = query_backend(state).view(filters)
+        if path == '/api/summary':
+            return summary(view)
+        if path == '/api/states':
+            return records(view.state_counts())
+        if path == '/api/top/postcodes':
+            return records(view.top_postcodes(k))
+        if path == '/api/top/suburbs':
+            return records(top_suburbs(view, state.postcodes, k))
+        if path == '/api/monthly':
+            return records(monthly(view))
+        if path == '/api/monthly/states':
+            return records(state_monthly(view))
+        return None
+
+    def respond(self, target, headers):
+        """(status, headers, body) for a GET of ``target`` with the request's headers."""
+        try:
+            if self.token and not hmac.compare_digest(headers.get('Authorization', ''), f"Bearer {self.token}"):
+                raise ApiError(401, "Missing or invalid bearer token")
+            url = urlsplit(target)
+            query = parse_qs(url.query)
+            try:
+                state = self.refresher.current()
+            except DataError as e:
+                raise ApiError(503, str(e)) from e
+            filters = self.filters(state, query)
+            k = self.top_k(query) if url.path.startswith('/api/top/') else None
+            key = (state.version, url.path, filters, k)
+            response = self.cache.get(key)
+            if response is None:
+                payload = self.payload(url.path, state, filters, k)
+                if payload is None:
+                    raise ApiError(404, f"No such endpoint: {url.path}")
+                body = json.dumps({'version': state.version, 'data': payload}).encode()
+                etag = f'"{state.version}-{hashlib.sha1(repr(key[1:]).encode()).hexdigest()[:16]}"'
+                response = (etag, body)
+                self.cache.put(key, response)
+            etag, body = response
+            response_headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+            if etag in [tag.strip() for tag in headers.get('If-None-Match', '').split(',')]:
+                return 304, response_headers, b''
+            return 200, dict(response_headers, **{'Content-Type': 'application/json'}), body
+        except ApiError as e:
+            return e.status, {'Content-Type': 'application/json'}, json.dumps({'error': str(e)}).encode()
+        except Exception:
+            # The details go to the server's log, not to a caller who may be off the host
+            logger.exception("Error answering %s", target)
+            return 500, {'Content-Type': 'application/json'}, json.dumps({'error': "Internal error"}).encode()
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    api = None
+
+    def do_GET(self):
+        status, headers, body = self.api.respond(self.path, self.headers)
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def is_loopback(host):
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def serve(api, host=API_HOST, port=API_PORT):
+    handler = type('Handler', (ApiHandler,), {'api': api})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the dashboard's aggregates as JSON.")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    args = parser.parse_args()
+    if not API_TOKEN and not is_loopback(args.host):
+        parser.error(f"refusing to serve on {args.host} without a token; set AU_ORDERS_API_TOKEN or use a loopback host")
+    server = serve(OrdersApi(data_refresher()), args.host, args.port)
+    print(f"Serving on http://{args.host}:{server.server_port}/api/summary")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
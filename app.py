@@ -1,9 +1,23 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 from datetime import datetime, date
-from io import StringIO
+from config import (
+    MAP_POINT_BUDGET, FIGURE_CACHE_SIZE, QUERY_BACKEND, PROFILE_RERUNS, METRICS_FILE, TIMESERIES_POINT_BUDGET, DEPOTS
+)
+from loader import DataError
+from datastate import data_refresher, query_backend, selection_filters
+from search import MATCH_MODES
+from growth import growth_table
+from postcodes import postcode_keys
+from mapgrid import MAP_LEVEL_NAMES
+from export import EXPORT_FORMATS, export_bytes
+from pager import SORT_COLUMNS
+from profiling import RerunProfile, memory_report, mib, resident_bytes
+from timeseries import GRANULARITIES, downsample, order_series
+from topk import TOP_K_CHOICES, top_k
+from figures import (
+    FigureCache, map_figure, mom_figure, orders_over_time_figure, postcode_scatter_figure,
+    state_bar_figure, state_mom_figure
+)
 
 # Streamlit page config
 st.set_page_config(page_title="AU Orders Report", layout="wide")
@@ -211,77 +225,77 @@ if password != "au_team_2025":  # Replace with a strong password
 # Test message
 st.write("Australia Location Review")
 
-# Load order data
-@st.cache_data
-def load_data():
-    url = "https://raw.githubusercontent.com/lshawc/au-orders-dashboard/main/au_report.csv"
+# Rebuilds the data state in a background thread every REFRESH_INTERVAL seconds,
+# so reruns always read a complete, warm state and never wait on ingestion
+@st.cache_resource
+def get_refresher():
+    return data_refresher()
+
+# Built chart figures shared across reruns and sessions
+@st.cache_resource
+def load_figure_cache():
+    return FigureCache(FIGURE_CACHE_SIZE)
+
+# Opt-in timings of each section of this rerun
+profile = RerunProfile(PROFILE_RERUNS, METRICS_FILE, backend=QUERY_BACKEND)
+profile.start("Load")
+
+try:
+    refresher = get_refresher()
+except DataError as e:
+    st.error(f"Error: {str(e)}")
+    st.stop()
+except Exception as e:
+    st.error(f"Error loading data: {str(e)}")
+    st.stop()
+previous_state = refresher.current()
+state = previous_state
+if st.sidebar.button("Refresh data"):
     try:
-        df = pd.read_csv(url)
-        required_cols = ['OrderID', 'OrderDate', 'PostalCode', 'State']
-        missing_cols = [col for col in required_cols if col not in df.columns]
-        if missing_cols:
-            st.error(f"Error: Missing columns: {', '.join(missing_cols)}. Available: {', '.join(df.columns)}")
-            st.stop()
-        df['OrderDate'] = pd.to_datetime(df['OrderDate'], format='%Y-%m-%d', errors='coerce')
-        df['State'] = df['State'].fillna('Unknown')
-        initial_len = len(df)
-        df = df.dropna(subset=['OrderDate'])
-        if len(df) < initial_len:
-            st.warning(f"Removed {initial_len - len(df)} rows with invalid OrderDate values.")
-        if df.empty:
-            st.error("Error: No valid OrderDate values after cleaning.")
-            st.stop()
-        df = df.astype({'OrderID': str, 'PostalCode': str, 'State': str})
-        if not df['OrderID'].str.startswith('AU').any():
-            st.warning("No OrderIDs start with 'AU'. Expected from query WHERE ID LIKE 'AU%'.")
-        return df
+        state = refresher.refresh()
     except Exception as e:
-        st.error(f"Error loading order data from {url}: {str(e)}")
-        st.stop()
-
-# Load postcode data
-@st.cache_data
-def load_postcode_data():
-    url = "https://raw.githubusercontent.com/lshawc/au-orders-dashboard/main/postcode_data.csv"
-    try:
-        postcode_df = pd.read_csv(url)
-    except:
-        st.warning("Postcode data not found. Using sample data.")
-        sample_csv = """postcode,place_name,state_name,state_code,latitude,longitude,accuracy
-200,Australian National University,Australian Capital Territory,ACT,-35.2777,149.1189,1
-221,Barton,Australian Capital Territory,ACT,-35.3049,149.1412,4
-2540,Jervis Bay,Australian Capital Territory,ACT,-35.1333,150.7,4
-2600,Deakin West,Australian Capital Territory,ACT,-35.3126,149.1278,3
-2000,Sydney,New South Wales,NSW,-33.8688,151.2093,4
-2010,Surry Hills,New South Wales,NSW,-33.8792,151.2070,4
-3000,Melbourne,Victoria,VIC,-37.8136,144.9631,4
-3001,Melbourne,Victoria,VIC,-37.8136,144.9631,4
-"""
-        postcode_df = pd.read_csv(StringIO(sample_csv))
-    required_cols = ['postcode', 'place_name', 'state_name', 'state_code']
-    missing_cols = [col for col in required_cols if col not in postcode_df.columns]
-    if missing_cols:
-        st.error(f"Postcode CSV missing columns: {', '.join(missing_cols)}")
-        st.stop()
-    postcode_df['postcode'] = postcode_df['postcode'].astype(str)
-    if 'accuracy' in postcode_df.columns:
-        postcode_df = postcode_df.sort_values(by=['postcode', 'accuracy'], ascending=[True, False])
-    postcode_df = postcode_df.groupby('postcode').first().reset_index()
-    initial_len = len(postcode_df)
-    postcode_df = postcode_df.dropna(subset=['latitude', 'longitude'])
-    if len(postcode_df) < initial_len:
-        st.warning(f"Removed {initial_len - len(postcode_df)} rows with invalid lat/lon values.")
-    return postcode_df
-
-df = load_data()
-postcode_df = load_postcode_data()
+        st.sidebar.error(f"Refresh failed: {str(e)}")
+    else:
+        if state.orders_version == previous_state.orders_version:
+            st.sidebar.caption("No new orders.")
+        elif state.appended is None:
+            st.sidebar.caption(f"Reloaded {len(state.df)} orders.")
+        else:
+            st.sidebar.caption(f"Added {len(state.appended)} new orders.")
+checked_at = datetime.fromtimestamp(refresher.checked_at).strftime("%H:%M:%S")
+if refresher.error is not None:
+    st.sidebar.warning(f"Background refresh failed ({refresher.error}); showing data checked at {checked_at}.")
+else:
+    st.sidebar.caption(f"Data checked at {checked_at}.")
+for warning in state.order_warnings + state.postcode_warnings:
+    st.warning(warning)
+df = state.df
+postcodes = state.postcodes
+map_grid = state.map_grid
+depots = state.depots
+backend = query_backend(state)
+profile.rows(len(df))
 
 # Sidebar filters
 st.sidebar.header("Filters")
-state_options = sorted(df['State'].unique())
-state_filter = st.sidebar.selectbox("State", ["All"] + state_options)
-min_date = df['OrderDate'].min().date()
-max_date = df['OrderDate'].max().date()
+state_options = backend.states()
+state_filter = st.sidebar.multiselect("State", state_options, placeholder="All states")
+postcode_filter = st.sidebar.multiselect(
+    "PostalCode / suburb", backend.postcode_keys(), format_func=postcodes.label, placeholder="All postcodes"
+)
+# Depots (by name) come first, then every postcode with coordinates
+near_location = st.sidebar.selectbox(
+    "Near depot or postcode",
+    [None] + depots.names.tolist() + postcodes.located_keys().tolist(),
+    format_func=lambda option: (
+        "Anywhere" if option is None
+        else f"{option} depot ({DEPOTS[option]})" if isinstance(option, str)
+        else postcodes.label(option)
+    )
+)
+near_postcode = DEPOTS[near_location] if isinstance(near_location, str) else near_location
+radius_km = st.sidebar.slider("Radius (km)", 1, 500, 25)
+min_date, max_date = backend.date_bounds()
 date_range = st.sidebar.date_input(
     "Order Date Range",
     [min_date, max_date],
@@ -289,47 +303,48 @@ date_range = st.sidebar.date_input(
     max_value=max_date
 )
 order_id_filter = st.sidebar.text_input("Search OrderID", "")
+order_id_mode = st.sidebar.radio("Match", MATCH_MODES, horizontal=True)
 
-# Filter data
-filtered_df = df.copy()
-if state_filter != "All":
-    filtered_df = filtered_df[filtered_df['State'] == state_filter]
-if len(date_range) == 2:
-    start_date, end_date = date_range
-    filtered_df = filtered_df[
-        (filtered_df['OrderDate'].dt.date >= start_date) &
-        (filtered_df['OrderDate'].dt.date <= end_date)
-    ]
-if order_id_filter:
-    try:
-        filtered_df = filtered_df[filtered_df['OrderID'].str.contains(order_id_filter, case=False, na=False)]
-    except Exception as e:
-        st.error(f"Invalid OrderID filter: {str(e)}")
-        filtered_df = df.copy()
+profile.start("Filter", rows_in=len(df))
+
+# Filter data: the query backend resolves the sidebar selection (row positions
+# into the shared frame for pandas, a WHERE clause for the embedded databases)
+start_date, end_date = date_range if len(date_range) == 2 else (None, None)
+# Multi-selects left empty do not restrict; the radius narrows the postcode selection
+filters = selection_filters(
+    state, state_filter, postcode_filter, near_postcode, radius_km,
+    start_date, end_date, order_id_filter, order_id_mode
+)
+
+# Counts for the summary, tables and charts: a cube slice or GROUP BY queries
+view = backend.view(filters)
+
+profile.rows(view.total())
 
 # Handle empty filtered data
-if filtered_df.empty:
+if view.total() == 0:
     st.warning("No orders match the selected filters.")
     st.stop()
 
+# Charts are cached per filter combination and data version; the theme is applied on reuse
+figures = load_figure_cache()
+figure_key = (state.version,) + filters
+
 # Determine if in light mode based on theme selection
 is_light_mode = (theme == "Light") or (theme == "Auto" and st.get_option("theme.base") == "light")
 
 # Summary section
+profile.start("Summary")
 st.markdown('<div class="section">', unsafe_allow_html=True)
 st.header("Summary")
-total_orders = len(filtered_df)
-top_state = filtered_df['State'].value_counts().index[0] if not filtered_df.empty else "N/A"
-top_state_count = filtered_df['State'].value_counts().iloc[0] if not filtered_df.empty else 0
+total_orders = view.total()
+state_counts = view.state_counts()
+top_state = state_counts['State'].iloc[0] if not state_counts.empty else "N/A"
+top_state_count = state_counts['OrderCount'].iloc[0] if not state_counts.empty else 0
 top_state_pct = (top_state_count / total_orders * 100) if total_orders > 0 else 0
 
 # Calculate MoM growth/loss
-mom_data = filtered_df.groupby(filtered_df['OrderDate'].dt.to_period('M')).size().reset_index(name='OrderCount')
-mom_data['OrderCount'] = mom_data['OrderCount'].astype(float)
-mom_data['MoM_Change'] = mom_data['OrderCount'].pct_change()
-mom_data['MoM_Change'] = mom_data['MoM_Change'].apply(
-    lambda x: 0 if pd.isna(x) or abs(x) == float('inf') else x * 100
-)
+mom_data = growth_table(view.monthly_counts())
 latest_mom = mom_data['MoM_Change'].iloc[-1] if not mom_data.empty and len(mom_data) > 1 else 0
 
 col1, col2, col3 = st.columns(3)
@@ -344,10 +359,12 @@ st.markdown(
 st.markdown('</div>', unsafe_allow_html=True)
 
 # Top Postal Codes Table
+profile.start("Top tables")
 st.markdown('<div class="section">', unsafe_allow_html=True)
-st.subheader("Top 10 Postal Codes")
-postal_counts = filtered_df.groupby(['PostalCode', 'State']).size().reset_index(name='OrderCount')
-postal_counts = postal_counts.sort_values('OrderCount', ascending=False).head(10)
+# Only the top K rows are selected from pre-aggregated counts, so a larger K costs the same
+top_n = st.radio("Show top", TOP_K_CHOICES, horizontal=True)
+st.subheader(f"Top {top_n} Postal Codes")
+postal_counts = view.top_postcodes(top_n)
 st.dataframe(
     postal_counts,
     use_container_width=True,
@@ -359,15 +376,8 @@ st.dataframe(
 )
 
 # Top Suburbs Table
-st.subheader("Top 10 Suburbs")
-suburb_data = filtered_df.merge(
-    postcode_df[['postcode', 'place_name', 'state_code']],
-    left_on='PostalCode',
-    right_on='postcode',
-    how='left'
-)
-suburb_counts = suburb_data.groupby(['place_name', 'state_code']).size().reset_index(name='OrderCount')
-suburb_counts = suburb_counts.sort_values('OrderCount', ascending=False).head(10)
+st.subheader(f"Top {top_n} Suburbs")
+suburb_counts = top_k(postcodes.suburb_counts(view.postcode_counts()), top_n)
 missing_suburbs = suburb_counts[suburb_counts['place_name'].isna()]
 if not missing_suburbs.empty:
     st.warning(
@@ -384,267 +394,203 @@ st.dataframe(
         "OrderCount": "Orders"
     }
 )
-st.markdown('</div>', unsafe_allow_html=True)
 
-# Visualisations
-st.header("Visualisations")
-st.markdown('<div class="section viz-section">', unsafe_allow_html=True)
-
-# Map of Australia
-st.subheader("Orders by Postal Code")
-postal_counts = filtered_df.groupby('PostalCode').size().reset_index(name='OrderCount')
-map_data = postal_counts.merge(
-    postcode_df[['postcode', 'latitude', 'longitude', 'state_name', 'place_name']],
-    left_on='PostalCode',
-    right_on='postcode',
-    how='left'
-)
-missing_coords = map_data[map_data['latitude'].isna() | map_data['longitude'].isna()]
-if not missing_coords.empty:
-    st.warning(
-        f"{len(missing_coords)} postcodes lack lat/lon data (e.g., {missing_coords['PostalCode'].iloc[0]}). "
-        "These will not appear on the map."
-    )
-map_data = map_data.dropna(subset=['latitude', 'longitude'])
-
-if not map_data.empty:
-    fig_map = px.scatter_mapbox(
-        map_data,
-        lat='latitude',
-        lon='longitude',
-        size='OrderCount',
-        color='OrderCount',
-        color_continuous_scale='Blues',
-        hover_data=['PostalCode', 'state_name', 'place_name', 'OrderCount'],
-        title="Orders by Postal Code",
-        size_max=30,
-        zoom=3,
-        center={"lat": -25.2744, "lon": 133.7751}
-    )
-    if is_light_mode:
-        fig_map.update_layout(
-            mapbox_style="carto-positron",
-            margin={"r":0, "t":0, "l":0, "b":0},
-            font=dict(color="#000000"),
-            paper_bgcolor="#ffffff",
-            plot_bgcolor="#ffffff",
-            coloraxis_colorbar_title="Orders"
-        )
-    else:
-        fig_map.update_layout(
-            mapbox_style="carto-darkmatter",
-            margin={"r":0, "t":0, "l":0, "b":0},
-            font=dict(color="#ffffff"),
-            paper_bgcolor="#222222",
-            plot_bgcolor="#222222",
-            coloraxis_colorbar_title="Orders"
-        )
-else:
-    st.error("No valid lat/lon data available for mapping.")
-    fig_map = px.scatter(
-        postal_counts,
-        x='PostalCode',
-        y='OrderCount',
-        size='OrderCount',
-        hover_data=['PostalCode'],
-        title="Orders by Postal Code (No Lat/Lon Data)",
-        labels={'OrderCount': 'Number of Orders'},
-        color_discrete_sequence=['#1976d2']
-    )
-    if is_light_mode:
-        fig_map.update_layout(
-            showlegend=False,
-            font=dict(color="#000000"),
-            paper_bgcolor="#ffffff",
-            plot_bgcolor="#ffffff"
-        )
-    else:
-        fig_map.update_layout(
-            showlegend=False,
-            font=dict(color="#ffffff"),
-            paper_bgcolor="#222222",
-            plot_bgcolor="#222222"
-        )
-st.plotly_chart(fig_map, use_container_width=True)
-
-# Bar Chart: Orders by State
-st.subheader("Orders by State")
-state_counts = filtered_df['State'].value_counts().reset_index()
-state_counts.columns = ['State', 'OrderCount']
-fig_bar = px.bar(
-    state_counts,
-    x='State',
-    y='OrderCount',
-    color='State',
-    color_discrete_sequence=px.colors.sequential.Blues[::-1],
-    title="Orders by State",
-    labels={'OrderCount': 'Number of Orders'}
-)
-if is_light_mode:
-    fig_bar.update_layout(
-        showlegend=False,
-        font=dict(color="#000000"),
-        paper_bgcolor="#ffffff",
-        plot_bgcolor="#ffffff"
-    )
-else:
-    fig_bar.update_layout(
-        showlegend=False,
-        font=dict(color="#ffffff"),
-        paper_bgcolor="#222222",
-        plot_bgcolor="#222222"
-    )
-st.plotly_chart(fig_bar, use_container_width=True)
-
-# Line Chart: Orders Over Time
-st.subheader("Orders Over Time")
-filtered_df['Month'] = filtered_df['OrderDate'].dt.to_period('M').astype(str)
-time_counts = filtered_df.groupby('Month').size().reset_index(name='OrderCount')
-fig_line = px.line(
-    time_counts,
-    x='Month',
-    y='OrderCount',
-    title="Orders Over Time",
-    labels={'OrderCount': 'Number of Orders'},
-    color_discrete_sequence=['#1976d2']
-)
-fig_line.update_traces(mode='lines+markers')
-if is_light_mode:
-    fig_line.update_layout(
-        font=dict(color="#000000"),
-        paper_bgcolor="#ffffff",
-        plot_bgcolor="#ffffff"
+# Distance from each order's postcode to its nearest depot, weighted by orders
+st.subheader("Distance to Nearest Depot")
+if len(depots):
+    depot_summary = depots.summary(view.postcode_counts(), radius_km)
+    st.dataframe(
+        depot_summary,
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "Median km": st.column_config.NumberColumn(format="%.1f"),
+            "P90 km": st.column_config.NumberColumn(format="%.1f"),
+            f"Within {radius_km} km": st.column_config.NumberColumn(format="%.1f%%"),
+        }
     )
 else:
-    fig_line.update_layout(
-        font=dict(color="#ffffff"),
-        paper_bgcolor="#222222",
-        plot_bgcolor="#222222"
-    )
-st.plotly_chart(fig_line, use_container_width=True)
-
-# State-Level MoM Growth
-st.subheader("State-Level MoM Growth")
-state_mom_data = filtered_df.groupby(['State', filtered_df['OrderDate'].dt.to_period('M')]).size().reset_index(name='OrderCount')
-state_mom_data['OrderDate'] = state_mom_data['OrderDate'].astype(str)
-state_mom_data['OrderCount'] = state_mom_data['OrderCount'].astype(float)
-state_mom_data['MoM_Change'] = state_mom_data.groupby('State')['OrderCount'].pct_change()
-state_mom_data['MoM_Change'] = state_mom_data['MoM_Change'].apply(
-    lambda x: 0 if pd.isna(x) or abs(x) == float('inf') else x * 100
-)
-if len(state_mom_data['OrderDate'].unique()) > 1 and state_mom_data['MoM_Change'].notna().any():
-    fig_state_mom = px.line(
-        state_mom_data,
-        x='OrderDate',
-        y='MoM_Change',
-        color='State',
-        title="Month-over-Month Growth by State (%)",
-        labels={'MoM_Change': 'MoM Change (%)', 'OrderDate': 'Month'},
-        color_discrete_sequence=px.colors.sequential.Blues[::-1]
+    st.info("No depots with known coordinates are configured (AU_ORDERS_DEPOTS).")
+st.markdown('</div>', unsafe_allow_html=True)
+
+# Visualisations: each chart sits in a tab whose aggregation and figure are only
+# built while it is open. Tabs and the map slider rerun just this fragment.
+VIZ_TABS = ["Map", "Orders by State", "Orders Over Time", "State MoM Growth", "MoM Growth/Loss"]
+
+def visualisations(view, figure_key, is_light_mode, state_counts, mom_data):
+    st.header("Visualisations")
+    st.markdown('<div class="section viz-section">', unsafe_allow_html=True)
+    map_tab, bar_tab, line_tab, state_mom_tab, mom_tab = st.tabs(VIZ_TABS, key="viz_tab", on_change="rerun")
+
+    # Map of Australia
+    if map_tab.open:
+        with map_tab:
+            st.subheader("Orders by Postal Code")
+            postal_counts = view.postcode_counts()
+            missing_coords = postal_counts[~map_grid.has_coords(postal_counts['PostcodeKey'])]
+            if not missing_coords.empty:
+                st.warning(
+                    f"{len(missing_coords)} postcodes lack lat/lon data (e.g., {missing_coords['PostalCode'].iloc[0]}). "
+                    "These will not appear on the map."
+                )
+            # Bin postcodes into grid cells so the map payload stays bounded
+            map_detail = st.select_slider("Map detail", options=["Auto"] + MAP_LEVEL_NAMES, value="Auto")
+            if map_detail == "Auto":
+                map_detail = map_grid.auto_level(postal_counts, MAP_POINT_BUDGET)
+            map_data = map_grid.bins(postal_counts, map_detail)
+            if map_detail != MAP_LEVEL_NAMES[0]:
+                st.caption(f"Showing {len(map_data)} grid cells ({map_detail}); each point is labelled with its busiest postcode.")
+
+            if not map_data.empty:
+                fig_map = figures.get(
+                    ('map', map_detail) + figure_key, lambda: map_figure(map_data), is_light_mode
+                )
+            else:
+                st.error("No valid lat/lon data available for mapping.")
+                fig_map = figures.get(
+                    ('postcode_scatter',) + figure_key, lambda: postcode_scatter_figure(postal_counts), is_light_mode
+                )
+            st.plotly_chart(fig_map, use_container_width=True)
+
+    # Bar Chart: Orders by State
+    if bar_tab.open:
+        with bar_tab:
+            st.subheader("Orders by State")
+            fig_bar = figures.get(('state_bar',) + figure_key, lambda: state_bar_figure(state_counts), is_light_mode)
+            st.plotly_chart(fig_bar, use_container_width=True)
+
+    # Line Chart: Orders Over Time
+    if line_tab.open:
+        with line_tab:
+            st.subheader("Orders Over Time")
+            granularity = st.radio("Granularity", GRANULARITIES, index=GRANULARITIES.index("Monthly"), horizontal=True)
+            # Binned straight from the day counts; long daily series are downsampled to the point budget
+            series = order_series(view.day_counts(), granularity)
+            shown = downsample(series, 'Period', 'OrderCount', TIMESERIES_POINT_BUDGET)
+            if len(shown) < len(series):
+                st.caption(f"Showing {len(shown)} of {len(series)} {granularity.lower()} points (LTTB downsampling).")
+            fig_line = figures.get(
+                ('orders_over_time', granularity) + figure_key,
+                lambda: orders_over_time_figure(shown, granularity),
+                is_light_mode
+            )
+            st.plotly_chart(fig_line, use_container_width=True)
+
+    # State-Level MoM Growth
+    if state_mom_tab.open:
+        with state_mom_tab:
+            st.subheader("State-Level MoM Growth")
+            state_mom_data = growth_table(view.state_monthly_counts(), by='State')
+            state_mom_data['OrderDate'] = state_mom_data['OrderDate'].astype(str)
+            if len(state_mom_data['OrderDate'].unique()) > 1 and state_mom_data['MoM_Change'].notna().any():
+                fig_state_mom = figures.get(
+                    ('state_mom',) + figure_key,
+                    lambda: state_mom_figure(
+                        downsample(state_mom_data, 'OrderDate', 'MoM_Change', TIMESERIES_POINT_BUDGET, by='State')
+                    ),
+                    is_light_mode
+                )
+                st.plotly_chart(fig_state_mom, use_container_width=True)
+            else:
+                st.write("Insufficient data for state-level MoM analysis (need at least 2 months with valid data).")
+
+    # Growth/Loss Chart
+    if mom_tab.open:
+        with mom_tab:
+            st.subheader("Overall Month-over-Month Growth/Loss")
+            if len(mom_data) > 1:
+                fig_mom = figures.get(
+                    ('mom',) + figure_key,
+                    lambda: mom_figure(downsample(mom_data, 'OrderDate', 'MoM_Change', TIMESERIES_POINT_BUDGET)),
+                    is_light_mode
+                )
+                st.plotly_chart(fig_mom, use_container_width=True)
+                st.dataframe(
+                    mom_data[['OrderDate', 'OrderCount', 'MoM_Change', 'YoY_Change']].astype({'OrderDate': str}),
+                    use_container_width=True,
+                    column_config={
+                        "OrderDate": "Month",
+                        "OrderCount": "Orders",
+                        "MoM_Change": st.column_config.NumberColumn("MoM Change", format="%.1f%%"),
+                        "YoY_Change": st.column_config.NumberColumn("YoY Change", format="%.1f%%")
+                    }
+                )
+            else:
+                st.write("Insufficient data for MoM analysis (need at least 2 months).")
+    st.markdown('</div>', unsafe_allow_html=True)
+
+# Timed inside the fragment, so tab and slider reruns are recorded too
+@st.fragment
+def show_visualisations(view, figure_key, is_light_mode, state_counts, mom_data):
+    profile.section(
+        f"Visualisations: {st.session_state.get('viz_tab') or VIZ_TABS[0]}",
+        lambda: visualisations(view, figure_key, is_light_mode, state_counts, mom_data)
     )
-    fig_state_mom.update_traces(mode='lines+markers')
-    if is_light_mode:
-        fig_state_mom.update_layout(
-            font=dict(color="#000000"),
-            paper_bgcolor="#ffffff",
-            plot_bgcolor="#ffffff",
-            showlegend=True
-        )
+
+show_visualisations(view, figure_key, is_light_mode, state_counts, mom_data)
+
+# Data Table with Drill-Down; paging and sorting rerun just this fragment
+def order_details(backend, filters, depots):
+    st.header("Order Details")
+    st.markdown('<div class="section">', unsafe_allow_html=True)
+    st.subheader("Filtered Orders")
+    if filters.order_id:
+        st.write(f"Showing orders matching OrderID: {filters.order_id}")
+    elif filters.states is not None:
+        st.write(f"Showing orders for State: {', '.join(filters.states)}")
     else:
-        fig_state_mom.update_layout(
-            font=dict(color="#ffffff"),
-            paper_bgcolor="#222222",
-            plot_bgcolor="#222222",
-            showlegend=True
-        )
-    st.plotly_chart(fig_state_mom, use_container_width=True)
-else:
-    st.write("Insufficient data for state-level MoM analysis (need at least 2 months with valid data).")
-
-# Growth/Loss Chart
-st.subheader("Overall Month-over-Month Growth/Loss")
-if len(mom_data) > 1:
-    fig_mom = go.Figure()
-    fig_mom.add_trace(go.Scatter(
-        x=mom_data['OrderDate'].astype(str),
-        y=mom_data['MoM_Change'].where(mom_data['MoM_Change'] >= 0),
-        mode='lines+markers',
-        name='Growth',
-        line=dict(color='#388e3c')
-    ))
-    fig_mom.add_trace(go.Scatter(
-        x=mom_data['OrderDate'].astype(str),
-        y=mom_data['MoM_Change'].where(mom_data['MoM_Change'] < 0),
-        mode='lines+markers',
-        name='Loss',
-        line=dict(color='#d32f2f')
-    ))
-    if is_light_mode:
-        fig_mom.update_layout(
-            title="Month-over-Month Growth/Loss (%)",
-            xaxis_title="Month",
-            yaxis_title="MoM Change (%)",
-            showlegend=True,
-            font=dict(color="#000000"),
-            paper_bgcolor="#ffffff",
-            plot_bgcolor="#ffffff"
-        )
+        st.write("Showing all orders")
+    # Only the rows of the requested page are fetched, in the chosen sort order
+    sort_col1, sort_col2, sort_col3 = st.columns(3)
+    with sort_col1:
+        sort_column = st.selectbox("Sort by", SORT_COLUMNS)
+    with sort_col2:
+        sort_ascending = st.radio("Order", ["Ascending", "Descending"], horizontal=True) == "Ascending"
+    with sort_col3:
+        after_order_id = st.text_input("Start after OrderID", "")
+    window = backend.window(filters, sort_column, sort_ascending, after_order_id)
+    if not window.found:
+        st.warning(f"OrderID {after_order_id} not found; showing from the first row.")
+    page_size = 100
+    page_count = max(-(-len(window) // page_size), 1)
+    page_number = st.number_input("Page", min_value=1, max_value=page_count, value=1, step=1)
+    start_idx = (page_number - 1) * page_size
+    page = window.rows(start_idx, page_size)
+    depot, depot_km = depots.nearest(postcode_keys(page['PostalCode']).to_numpy())
+    page = page.assign(**{"Nearest Depot": depot, "Depot km": depot_km.round(1)})
+    st.dataframe(page, use_container_width=True)
+    if len(page):
+        rows_text = f"rows {start_idx + 1} to {start_idx + len(page)} of {len(window)}"
+        if after_order_id and window.found:
+            rows_text += f" after OrderID {after_order_id}"
+        st.write(f"Showing {rows_text} (page {page_number} of {page_count})")
     else:
-        fig_mom.update_layout(
-            title="Month-over-Month Growth/Loss (%)",
-            xaxis_title="Month",
-            yaxis_title="MoM Change (%)",
-            showlegend=True,
-            font=dict(color="#ffffff"),
-            paper_bgcolor="#222222",
-            plot_bgcolor="#222222"
-        )
-    st.plotly_chart(fig_mom, use_container_width=True)
-    mom_data['MoM_Change'] = mom_data['MoM_Change'].apply(lambda x: f"{x:.1f}%" if pd.notnull(x) else "N/A")
-    st.dataframe(
-        mom_data[['OrderDate', 'OrderCount', 'MoM_Change']].rename(
-            columns={'OrderDate': 'Month', 'OrderCount': 'Orders', 'MoM_Change': 'MoM Change'}
-        ),
-        use_container_width=True
-    )
-else:
-    st.write("Insufficient data for MoM analysis (need at least 2 months).")
-st.markdown('</div>', unsafe_allow_html=True)
+        st.write(f"No rows after OrderID {after_order_id}.")
+    st.markdown('</div>', unsafe_allow_html=True)
 
-# Data Table with Drill-Down
-st.header("Order Details")
-st.markdown('<div class="section">', unsafe_allow_html=True)
-st.subheader("Filtered Orders")
-if order_id_filter:
-    st.write(f"Showing orders matching OrderID: {order_id_filter}")
-elif state_filter != "All":
-    st.write(f"Showing orders for State: {state_filter}")
-else:
-    st.write("Showing all orders")
-page_size = 100
-page_number = st.number_input("Page", min_value=1, value=1, step=1)
-start_idx = (page_number - 1) * page_size
-end_idx = start_idx + page_size
-st.dataframe(
-    filtered_df[['OrderID', 'OrderDate', 'PostalCode', 'State']].iloc[start_idx:end_idx],
-    use_container_width=True
-)
-st.write(f"Showing rows {start_idx + 1} to {min(end_idx, len(filtered_df))} of {len(filtered_df)}")
-st.markdown('</div>', unsafe_allow_html=True)
+@st.fragment
+def show_order_details(backend, filters, depots):
+    profile.section("Order Details", lambda: order_details(backend, filters, depots))
+
+show_order_details(backend, filters, depots)
 
 # Download button
+profile.start("Download")
 st.markdown('<div class="section">', unsafe_allow_html=True)
 st.header("Download Data")
-csv = filtered_df.to_csv(index=False).encode('utf-8')
+export_format = st.radio("Format", list(EXPORT_FORMATS), horizontal=True)
+export_name, export_mime = EXPORT_FORMATS[export_format]
+# The file is only built when the button is clicked, not on every rerun
 st.download_button(
-    label="Download filtered data as CSV",
-    data=csv,
-    file_name="au_orders_filtered.csv",
-    mime="text/csv"
+    label=f"Download filtered data as {export_format}",
+    data=lambda: profile.measure("Download file", lambda: export_bytes(backend.rows(filters), export_format)),
+    file_name=export_name,
+    mime=export_mime
 )
 st.markdown('</div>', unsafe_allow_html=True)
 
 # Feedback form
+profile.start("Feedback")
 st.markdown('<div class="section feedback-section">', unsafe_allow_html=True)
 st.header("Feedback")
 feedback = st.text_area("Enter your feedback")
@@ -661,3 +607,18 @@ st.markdown(
     "and temporal patterns. *Note*: Renamed 'Top 10 Towns' to 'Top 10 Suburbs' and updated to use state abbreviations (e.g., NSW, VIC)."
 )
 st.markdown('</div>', unsafe_allow_html=True)
+
+# Rerun profile
+profile.write_metrics()
+if PROFILE_RERUNS:
+    with st.expander("Rerun profile"):
+        st.dataframe(profile.frame(), use_container_width=True)
+    with st.expander("Memory usage"):
+        components = {f"orders: {col}": df[col] for col in df.columns}
+        components.update({
+            "cube": state.cube, "date/state/postcode index": state.index,
+            "OrderID search index": state.search_index, "table pager": state.pager,
+            "postcodes + map grid": (postcodes, map_grid), "spatial indexes": (state.postcode_tree, depots),
+        })
+        st.dataframe(memory_report(components, len(df)), use_container_width=True, hide_index=True)
+        st.caption(f"Process resident size: {mib(resident_bytes())} MiB")
@@ -0,0 +1,471 @@
+import os
+import sqlite3
+import threading
+import uuid
+import weakref
+
+import pandas as pd
+
+from cube import OrderCube, count_orders
+from filters import restrict
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+TABLE_COLUMNS = ['OrderID', 'OrderDate', 'PostalCode', 'State']
+
+
+class PandasBackend:
+    """Answers the dashboard's queries from the in-memory frame, cube and indexes.
+
+    Filters resolve to row positions through the date/state and OrderID
+    indexes; aggregates come from the cube (or from the matched rows for an
+    OrderID search) and table pages from the pager's sorted permutations.
+    """
+
+    def __init__(self, df, cube, index, search_index, pager, version):
+        self.df = df
+        self.cube = cube
+        self.index = index
+        self.search_index = search_index
+        self.pager = pager
+        self.version = version
+        self.selected = {}
+
+    def states(self):
+        return sorted(self.index.state_bitmaps)
+
+    def postcode_keys(self):
+        return sorted(key for key in self.index.postcode_bitmaps if key >= 0)
+
+    def date_bounds(self):
+        return self.index.min_date(), self.index.max_date()
+
+    def positions(self, filters):
+        if filters not in self.selected:
+            positions = self.index.positions(
+                filters.states, filters.postcode_keys, filters.start_date, filters.end_date
+            )
+            if filters.order_id:
+                positions = restrict(positions, self.search_index.search(filters.order_id, filters.order_id_mode))
+            self.selected[filters] = positions
+        return self.selected[filters]
+
+    def view(self, filters):
+        # An OrderID search is row-level, so its matches are aggregated on the fly
+        if filters.order_id:
+            return OrderCube(count_orders(self.df.iloc[self.positions(filters)]))
+        return self.cube.slice(filters.states, filters.start_date, filters.end_date, filters.postcode_keys)
+
+    def window(self, filters, sort_column='OrderDate', ascending=True, after_order_id=None):
+        ordering = self.pager.ordering((self.version, filters), self.positions(filters), sort_column, ascending)
+        first = 0
+        found = True
+        if after_order_id:
+            after_rows = self.search_index.search(after_order_id, "Exact")
+            found = len(after_rows) > 0
+            if found:
+                first = ordering.after(self.pager.rank(after_rows[0], sort_column, ascending))
+        return PandasWindow(self.df, ordering, first, found)
+
+    def rows(self, filters):
+        return self.df.iloc[self.positions(filters)]
+
+
+class PandasWindow:
+    """Rows of a pager ordering from ``first`` on."""
+
+    def __init__(self, df, ordering, first, found):
+        self.df = df
+        self.ordering = ordering
+        self.first = first
+        self.found = found
+
+    def __len__(self):
+        return len(self.ordering) - self.first
+
+    def rows(self, start, size):
+        return self.df[TABLE_COLUMNS].iloc[self.ordering.window(self.first + start, size)]
+
+
+class SqlStore:
+    """An embedded database file holding the orders tables the SqlBackends query.
+
+    The orders are copied into an orders table with the row position, day
+    and month precomputed. ``engine`` is "sqlite" (standard library) or
+    "duckdb" (optional dependency, multi-threaded and columnar).
+
+    Each DataState gets its own SqlBackend generation: ``load`` fills a new
+    table through a second connection while queries keep reading the old
+    ones, and ``append`` adds rows after the last generation's, which sees
+    only the positions below its own row count. So a state being served
+    never sees rows loaded after it. A table is dropped once no generation
+    that reads it is left.
+
+    The file, ``orders-<n>.<engine>`` in ``directory``, is claimed with a
+    lock for as long as the store is open, so concurrent processes (the
+    dashboard and api.py, say) each get a file of their own and never load
+    into or drop another's tables. ``stamp`` is an optional callable naming
+    the frame passed to ``load`` across processes (the order snapshot's
+    ``stamp``); the file records the stamp its last table was loaded with,
+    so the next process to claim it reuses that table while the snapshot is
+    unchanged instead of copying every row again.
+
+    This does not save memory or time over the pandas backend: the frame
+    is still loaded and held for the DataState, and unfiltered aggregates
+    and deep pages scan the table on each query, where the pandas backend
+    reads its cube and sorted permutations.
+    """
+
+    def __init__(self, directory, engine="sqlite", stamp=None):
+        if engine == "duckdb" and duckdb is None:
+            raise RuntimeError("The duckdb query backend needs the duckdb package (pip install duckdb).")
+        if engine not in ("sqlite", "duckdb"):
+            raise ValueError(f"Unknown query backend: {engine}")
+        self.path, self.claim = self.claim_file(directory, engine)
+        if engine == "duckdb":
+            self.connection = duckdb.connect(self.path)
+        else:
+            self.connection = sqlite3.connect(self.path, check_same_thread=False)
+            # Write-ahead logging lets the loading connection commit while this one reads
+            self.connection.execute("PRAGMA journal_mode=WAL")
+        self.engine = engine
+        self.stamp = stamp
+        self.lock = threading.Lock()
+        # Every generation still in use, to know which tables can be dropped
+        self.backends = weakref.WeakSet()
+
+    @staticmethod
+    def claim_file(directory, engine):
+        """(path, open lock file) of the first database file in ``directory`` no other process holds."""
+        if fcntl is None:
+            # No advisory locks (Windows): a file per process, not reused after it exits
+            return os.path.join(directory, f"orders-{os.getpid()}.{engine}"), None
+        n = 0
+        while True:
+            path = os.path.join(directory, f"orders-{n}.{engine}")
+            claim = open(path + ".lock", "w")
+            try:
+                fcntl.flock(claim, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return path, claim
+            except OSError:
+                claim.close()
+                n += 1
+
+    def query(self, sql, params=()):
+        with self.lock:
+            cursor = self.connection.execute(sql, list(params))
+            names = [column[0] for column in cursor.description]
+            return pd.DataFrame(cursor.fetchall(), columns=names)
+
+    def writer(self):
+        """A separate connection to load through while queries use ``connection``."""
+        if self.engine == "duckdb":
+            return self.connection.cursor()
+        return sqlite3.connect(self.path, check_same_thread=False)
+
+    def tables(self, connection):
+        if self.engine == "duckdb":
+            sql = "SELECT table_name FROM information_schema.tables"
+        else:
+            sql = "SELECT name FROM sqlite_master WHERE type = 'table'"
+        return [row[0] for row in connection.execute(sql).fetchall()]
+
+    def loaded_table(self, df):
+        """Name of an existing table recorded as loaded from this exact frame, or None."""
+        stamp = self.stamp() if self.stamp is not None else None
+        if stamp is None:
+            return None
+        with self.lock:
+            tables = self.tables(self.connection)
+            found = []
+            if "loaded" in tables:
+                found = self.connection.execute("SELECT table_name, rows, stamp FROM loaded").fetchall()
+        if not found:
+            return None
+        table, rows, loaded_stamp = found[0]
+        if rows != len(df) or loaded_stamp != stamp or table not in tables:
+            return None
+        return table
+
+    def record(self, connection, table, rows):
+        """Note which frame ``table`` now holds, in the same transaction as the load."""
+        stamp = self.stamp() if self.stamp is not None else None
+        connection.execute("CREATE TABLE IF NOT EXISTS loaded (table_name VARCHAR, rows BIGINT, stamp VARCHAR)")
+        connection.execute("DELETE FROM loaded")
+        connection.execute("INSERT INTO loaded VALUES (?, ?, ?)", [table, rows, stamp])
+
+    def generation(self, table, rows, columns):
+        backend = SqlBackend(self, table, rows, columns)
+        self.backends.add(backend)
+        self.drop_unused(table)
+        return backend
+
+    def load(self, df):
+        """A SqlBackend over all of ``df``."""
+        columns = [col for col in df.columns if col != 'PostcodeKey']
+        table = self.loaded_table(df)
+        if table is not None:
+            return self.generation(table, len(df), columns)
+        table = f"orders_{uuid.uuid4().hex[:12]}"
+        # The row position is SQLite's rowid, so a generation's bound is a range on the table's key
+        pos = "pos INTEGER PRIMARY KEY" if self.engine == "sqlite" else "pos BIGINT"
+        writer = self.writer()
+        try:
+            writer.execute(
+                f"CREATE TABLE {table} ({pos}, OrderID VARCHAR, OrderDate VARCHAR, Day VARCHAR, "
+                "Month VARCHAR, PostalCode VARCHAR, PostcodeKey INTEGER, State VARCHAR)"
+            )
+            self.insert(writer, table, df, 0)
+            writer.execute(f"CREATE INDEX {table}_day ON {table} (Day)")
+            writer.execute(f"CREATE INDEX {table}_state_day ON {table} (State, Day)")
+            writer.execute(f"CREATE INDEX {table}_postcode_day ON {table} (PostcodeKey, Day)")
+            writer.execute(f"CREATE INDEX {table}_order_id ON {table} (OrderID)")
+            self.record(writer, table, len(df))
+            self.commit(writer)
+        finally:
+            writer.close()
+        return self.generation(table, len(df), columns)
+
+    def append(self, backend, rows):
+        """The next generation of ``backend`` with ``rows`` after its own, or None if it has no next.
+
+        Rows past ``backend.row_count`` left by a build that failed are replaced;
+        if a later generation of the table is still in use, there is no next
+        one, and the caller loads the whole frame into a new table instead.
+        """
+        later = [other for other in list(self.backends) if other.table == backend.table]
+        if any(other.row_count > backend.row_count for other in later):
+            return None
+        writer = self.writer()
+        try:
+            writer.execute(f"DELETE FROM {backend.table} WHERE pos >= ?", [backend.row_count])
+            self.insert(writer, backend.table, rows, backend.row_count)
+            self.record(writer, backend.table, backend.row_count + len(rows))
+            self.commit(writer)
+        finally:
+            writer.close()
+        return self.generation(backend.table, backend.row_count + len(rows), backend.columns)
+
+    def drop_unused(self, current):
+        """Drop the tables no generation reads any more, except ``current``.
+
+        Only this process has the file open, so tables an earlier holder of it
+        left behind are read by no one and are dropped as well.
+        """
+        live = {backend.table for backend in list(self.backends)} | {current}
+        with self.lock:
+            for name in self.tables(self.connection):
+                if name.startswith("orders") and name not in live:
+                    self.connection.execute(f"DROP TABLE {name}")
+            self.commit(self.connection)
+
+    def commit(self, connection):
+        # DuckDB runs each statement in its own transaction
+        if self.engine == "sqlite":
+            connection.commit()
+
+    def insert(self, connection, table, df, start):
+        dates = df['OrderDate']
+        rows = pd.DataFrame({
+            'pos': range(start, start + len(df)),
+            'OrderID': df['OrderID'].astype(str).to_numpy(),
+            'OrderDate': dates.dt.strftime('%Y-%m-%d %H:%M:%S').to_numpy(),
+            'Day': dates.dt.strftime('%Y-%m-%d').to_numpy(),
+            'Month': dates.dt.strftime('%Y-%m').to_numpy(),
+            'PostalCode': df['PostalCode'].astype(str).to_numpy(),
+            'PostcodeKey': df['PostcodeKey'].astype(int).to_numpy(),
+            'State': df['State'].astype(str).to_numpy(),
+        })
+        if self.engine == "duckdb":
+            connection.register('incoming', rows)
+            connection.execute(f"INSERT INTO {table} SELECT * FROM incoming")
+            connection.unregister('incoming')
+        else:
+            # Columns as Python lists zipped into rows: no per-row object conversion by pandas
+            connection.executemany(
+                f"INSERT INTO {table} VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                zip(*(rows[col].tolist() for col in rows.columns))
+            )
+
+
+class SqlBackend:
+    """Answers the dashboard's queries with SQL against one generation of a SqlStore's orders table.
+
+    The generation is the table's first ``row_count`` positions: every filter,
+    aggregate and table page is pushed down as a query over them, so rows
+    appended for a later DataState are never counted.
+    """
+
+    def __init__(self, store, table, rows, columns):
+        self.store = store
+        self.table = table
+        self.row_count = rows
+        self.columns = columns
+
+    def query(self, sql, params=()):
+        """Run ``sql`` and return its rows; ``{orders}`` in ``sql`` names this generation's rows."""
+        orders = f"(SELECT * FROM {self.table} WHERE pos < {int(self.row_count)}) AS orders"
+        return self.store.query(sql.format(orders=orders), params)
+
+    def where(self, filters):
+        """SQL condition and parameters for a Filters selection."""
+        clauses = []
+        params = []
+        if filters.states is not None:
+            clauses.append(f"State IN ({', '.join('?' * len(filters.states)) or 'NULL'})")
+            params.extend(filters.states)
+        if filters.postcode_keys is not None:
+            # Integers, so they are written inline rather than as thousands of parameters
+            clauses.append(f"PostcodeKey IN ({', '.join(str(int(key)) for key in filters.postcode_keys) or 'NULL'})")
+        if filters.start_date is not None:
+            clauses.append("Day >= ?")
+            params.append(filters.start_date.isoformat())
+        if filters.end_date is not None:
+            clauses.append("Day <= ?")
+            params.append(filters.end_date.isoformat())
+        if filters.order_id:
+            key = filters.order_id.lower()
+            if filters.order_id_mode == "Exact":
+                clauses.append("lower(OrderID) = ?")
+                params.append(key)
+            elif filters.order_id_mode == "Starts with":
+                clauses.append(f"substr(lower(OrderID), 1, {len(key)}) = ?")
+                params.append(key)
+            else:
+                clauses.append("instr(lower(OrderID), ?) > 0")
+                params.append(key)
+        return " AND ".join(clauses) or "1 = 1", params
+
+    def states(self):
+        return self.query("SELECT DISTINCT State FROM {orders} ORDER BY State")['State'].tolist()
+
+    def postcode_keys(self):
+        return self.query(
+            "SELECT DISTINCT PostcodeKey FROM {orders} WHERE PostcodeKey >= 0 ORDER BY PostcodeKey"
+        )['PostcodeKey'].tolist()
+
+    def date_bounds(self):
+        bounds = self.query("SELECT MIN(Day) AS lo, MAX(Day) AS hi FROM {orders}").iloc[0]
+        return pd.Timestamp(bounds['lo']).date(), pd.Timestamp(bounds['hi']).date()
+
+    def view(self, filters):
+        return SqlView(self, *self.where(filters))
+
+    def window(self, filters, sort_column='OrderDate', ascending=True, after_order_id=None):
+        where, params = self.where(filters)
+        found = True
+        if after_order_id:
+            anchor = self.query(
+                f"SELECT {sort_column} AS value, pos FROM {{orders}} WHERE lower(OrderID) = ? ORDER BY pos LIMIT 1",
+                [after_order_id.lower()]
+            )
+            found = not anchor.empty
+            if found:
+                # Keyset condition: strictly after the anchor row in (sort column, pos) order
+                op = ">" if ascending else "<"
+                value, pos = anchor['value'].iloc[0], int(anchor['pos'].iloc[0])
+                where += f" AND ({sort_column} {op} ? OR ({sort_column} = ? AND pos {op} ?))"
+                params = params + [value, value, pos]
+        return SqlWindow(self, where, params, sort_column, ascending, found)
+
+    def rows(self, filters):
+        where, params = self.where(filters)
+        rows = self.query(f"SELECT {', '.join(self.columns)} FROM {{orders}} WHERE {where} ORDER BY pos", params)
+        return rows.assign(OrderDate=pd.to_datetime(rows['OrderDate']))
+
+
+class SqlView:
+    """The OrderCube queries for one filter selection, answered by GROUP BY queries."""
+
+    def __init__(self, backend, where, params):
+        self.backend = backend
+        self.where = where
+        self.params = params
+        self.results = {}
+
+    def grouped(self, columns, order_by=None, limit=None):
+        key = (tuple(columns), order_by, limit)
+        if key not in self.results:
+            select = ", ".join(columns + ["COUNT(*) AS OrderCount"])
+            group_by = ", ".join(columns)
+            self.results[key] = self.backend.query(
+                f"SELECT {select} FROM {{orders}} WHERE {self.where} GROUP BY {group_by} "
+                f"ORDER BY {order_by or group_by}" + (f" LIMIT {int(limit)}" if limit is not None else ""),
+                self.params
+            )
+        return self.results[key]
+
+    def total(self):
+        if 'total' not in self.results:
+            self.results['total'] = int(
+                self.backend.query(f"SELECT COUNT(*) AS n FROM {{orders}} WHERE {self.where}", self.params)['n'].iloc[0]
+            )
+        return self.results['total']
+
+    def state_counts(self):
+        """Orders per State, largest first (like ``value_counts``)."""
+        return self.grouped(['State'], "OrderCount DESC, State")
+
+    def top_postcodes(self, k):
+        """The ``k`` (PostalCode, State) pairs with the most orders, largest first."""
+        return self.grouped(['PostalCode', 'State'], "OrderCount DESC, PostalCode, State", k)
+
+    def postcode_counts(self):
+        return self.grouped(['PostalCode', 'PostcodeKey'])
+
+    def day_counts(self):
+        counts = self.grouped(['Day'])
+        return pd.DataFrame({'Day': pd.to_datetime(counts['Day']), 'OrderCount': counts['OrderCount']})
+
+    def monthly_counts(self):
+        """Orders per calendar month, with the month as a Period in ``OrderDate``."""
+        counts = self.grouped(['Month'])
+        return pd.DataFrame({
+            'OrderDate': pd.PeriodIndex(counts['Month'], freq='M'),
+            'OrderCount': counts['OrderCount']
+        })
+
+    def state_monthly_counts(self):
+        counts = self.grouped(['State', 'Month'])
+        return pd.DataFrame({
+            'State': counts['State'],
+            'OrderDate': pd.PeriodIndex(counts['Month'], freq='M'),
+            'OrderCount': counts['OrderCount']
+        })
+
+
+class SqlWindow:
+    """A sorted, keyset-anchored table selection read a page at a time with LIMIT/OFFSET."""
+
+    def __init__(self, backend, where, params, sort_column, ascending, found=True):
+        self.backend = backend
+        self.where = where
+        self.params = params
+        direction = 'ASC' if ascending else 'DESC'
+        self.order_by = f"{sort_column} {direction}, pos {direction}"
+        self.found = found
+        self.length = None
+
+    def __len__(self):
+        if self.length is None:
+            self.length = int(
+                self.backend.query(f"SELECT COUNT(*) AS n FROM {{orders}} WHERE {self.where}", self.params)['n'].iloc[0]
+            )
+        return self.length
+
+    def rows(self, start, size):
+        rows = self.backend.query(
+            f"SELECT pos, {', '.join(TABLE_COLUMNS)} FROM {{orders}} WHERE {self.where} "
+            f"ORDER BY {self.order_by} LIMIT {int(size)} OFFSET {int(start)}",
+            self.params
+        )
+        rows = rows.set_index('pos').rename_axis(None)
+        return rows.assign(OrderDate=pd.to_datetime(rows['OrderDate']))
@@ -0,0 +1,201 @@
+"""Headless benchmark of the dashboard's data pipeline on synthetic orders.
+
+Runs the same steps as a dashboard rerun (load, index, filter, summary,
+Top tables, map, charts, table page, export) without Streamlit and reports
+wall time and peak memory per stage. Memory is the process's peak resident
+set size during the stage above what it held when the stage started, sampled
+from /proc (tracemalloc would be exact for Python allocations but slows the
+string-heavy stages several times over).
+
+Usage: python bench.py [--rows 10000 1000000 10000000] [--backend pandas] [--json results.json]
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import date
+
+import pandas as pd
+
+from backends import PandasBackend, SqlStore
+from config import CACHE_DIR, POSTCODES_SOURCE
+from cube import OrderCube
+from export import export_bytes
+from figures import map_figure, mom_figure, orders_over_time_figure, state_bar_figure, state_mom_figure
+from filters import Filters, OrderIndex
+from growth import growth_table
+from loader import clean_postcodes, order_snapshot, representatives
+from mapgrid import MapGrid
+from pager import OrderPager
+from profiling import PeakMemory
+from postcodes import PostcodeDimension
+from search import OrderIdIndex
+from synth import write_orders
+from timeseries import order_series
+from topk import TOP_K_CHOICES, top_k
+
+DEFAULT_ROWS = [10_000, 1_000_000]
+
+
+def stage_load_orders(ctx):
+    ctx['snapshot'] = order_snapshot(ctx['source'], ctx['cache_dir'])
+    ctx['df'], _ = ctx['snapshot'].load()
+
+
+def stage_reload_orders(ctx):
+    # A fresh process start: the frame comes from the Parquet snapshot
+    ctx['df'], _ = order_snapshot(ctx['source'], ctx['cache_dir']).load()
+
+
+def stage_load_postcodes(ctx):
+    localities, _ = clean_postcodes(ctx['postcodes_raw'].copy())
+    ctx['postcodes'] = PostcodeDimension(representatives(localities))
+    ctx['map_grid'] = MapGrid(ctx['postcodes'])
+
+
+def stage_build_indexes(ctx):
+    df = ctx['df']
+    if ctx['backend_name'] == "pandas":
+        ctx['backend'] = PandasBackend(
+            df, OrderCube.from_orders(df), OrderIndex(df), OrderIdIndex(df), OrderPager(df), 1
+        )
+    else:
+        store = SqlStore(ctx['cache_dir'], ctx['backend_name'])
+        ctx['backend'] = store.load(df)
+
+
+def stage_filter(ctx):
+    backend = ctx['backend']
+    start, end = backend.date_bounds()
+    ctx['filters'] = [
+        Filters(None, None, start, end, "", "Contains"),
+        Filters(("VIC",), None, date(2023, 1, 1), date(2024, 6, 30), "", "Contains"),
+        Filters(("NSW", "QLD"), tuple(range(2000, 2300)) + tuple(range(4000, 4300)), start, end, "", "Contains"),
+        Filters(None, None, start, end, "AU44", "Contains"),
+    ]
+    ctx['views'] = [backend.view(filters) for filters in ctx['filters']]
+    ctx['totals'] = [view.total() for view in ctx['views']]
+
+
+def stage_summary(ctx):
+    for view in ctx['views']:
+        view.state_counts()
+        growth_table(view.monthly_counts())
+        growth_table(view.state_monthly_counts(), by='State')
+
+
+def stage_top_tables(ctx):
+    for view in ctx['views']:
+        for k in TOP_K_CHOICES:
+            view.top_postcodes(k)
+            top_k(ctx['postcodes'].suburb_counts(view.postcode_counts()), k)
+
+
+def stage_map(ctx):
+    map_grid = ctx['map_grid']
+    ctx['map_data'] = []
+    for view in ctx['views']:
+        postal_counts = view.postcode_counts()
+        level = map_grid.auto_level(postal_counts, 1000)
+        ctx['map_data'].append(map_grid.bins(postal_counts, level))
+
+
+def stage_figures(ctx):
+    for view, map_data in zip(ctx['views'], ctx['map_data']):
+        mom_data = growth_table(view.monthly_counts())
+        time_counts = order_series(view.day_counts(), "Monthly")
+        state_mom_data = growth_table(view.state_monthly_counts(), by='State').astype({'OrderDate': str})
+        map_figure(map_data)
+        state_bar_figure(view.state_counts())
+        orders_over_time_figure(time_counts, "Monthly")
+        state_mom_figure(state_mom_data)
+        mom_figure(mom_data)
+
+
+def stage_table_page(ctx):
+    backend = ctx['backend']
+    for filters in ctx['filters']:
+        for column in ('OrderDate', 'OrderID'):
+            window = backend.window(filters, column, True)
+            window.rows(0, 100)
+            window.rows(max(len(window) - 100, 0), 100)
+
+
+def stage_export(ctx):
+    export_bytes(ctx['backend'].rows(ctx['filters'][1]), "CSV")
+
+
+STAGES = [
+    ("load orders (CSV)", stage_load_orders),
+    ("load orders (snapshot)", stage_reload_orders),
+    ("load postcodes", stage_load_postcodes),
+    ("build indexes", stage_build_indexes),
+    ("filter", stage_filter),
+    ("summary + MoM", stage_summary),
+    ("top tables", stage_top_tables),
+    ("map bins", stage_map),
+    ("figures", stage_figures),
+    ("table pages", stage_table_page),
+    ("export (CSV)", stage_export),
+]
+
+
+def run_stages(ctx):
+    """Run every stage on ``ctx``; returns [(stage, seconds, peak MiB)]."""
+    results = []
+    for name, stage in STAGES:
+        with PeakMemory() as memory:
+            started = time.perf_counter()
+            stage(ctx)
+            elapsed = time.perf_counter() - started
+        results.append((name, elapsed, memory.growth() / 2 ** 20))
+    return results
+
+
+def synthetic_source(rows, data_dir, postcodes_raw, seed=0):
+    """Path of a synthetic order CSV with ``rows`` rows, generated once per size and seed."""
+    path = os.path.join(data_dir, f"synthetic-{rows}-{seed}.csv")
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        write_orders(path + ".tmp", rows, postcodes_raw, seed)
+        os.replace(path + ".tmp", path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard's data pipeline on synthetic orders.")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS)
+    parser.add_argument("--backend", choices=["pandas", "sqlite", "duckdb"], default="pandas")
+    parser.add_argument("--postcodes", default=POSTCODES_SOURCE)
+    parser.add_argument("--data-dir", default=os.path.join(CACHE_DIR, "bench"))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    postcodes_raw = pd.read_csv(args.postcodes)
+    report = []
+    for rows in args.rows:
+        source = synthetic_source(rows, args.data_dir, postcodes_raw, args.seed)
+        cache_dir = tempfile.mkdtemp(prefix="au-orders-bench-")
+        try:
+            ctx = {
+                'source': source, 'cache_dir': cache_dir, 'postcodes_raw': postcodes_raw,
+                'backend_name': args.backend,
+            }
+            results = run_stages(ctx)
+        finally:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+        print(f"\n{rows:,} orders ({args.backend})")
+        print(f"  {'stage':<24}{'seconds':>10}{'peak +MiB':>12}")
+        for name, seconds, peak in results:
+            print(f"  {name:<24}{seconds:>10.3f}{peak:>12.1f}")
+            report.append({'rows': rows, 'backend': args.backend, 'stage': name, 'seconds': seconds, 'peak_mib': peak})
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
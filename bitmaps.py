@@ -0,0 +1,142 @@
+import numpy as np
+
+# Positions are grouped into chunks of 2**16 by their high bits, like Roaring bitmaps
+CHUNK_BITS = 16
+CHUNK_SIZE = 1 << CHUNK_BITS
+# A chunk with more set bits than this is stored as a bitset (at 4096 both take 8 KiB)
+ARRAY_LIMIT = 4096
+
+
+def to_bitset(low):
+    """1024 uint64 words with the bits of the uint16 values in ``low`` set."""
+    dense = np.zeros(CHUNK_SIZE, dtype=bool)
+    dense[low] = True
+    return np.packbits(dense, bitorder='little').view(np.uint64)
+
+
+def to_array(words):
+    """Sorted uint16 values of the set bits in a bitset."""
+    return np.flatnonzero(np.unpackbits(words.view(np.uint8), bitorder='little')).astype(np.uint16)
+
+
+def compact(container):
+    """Store a chunk in whichever form is smaller; None if it is empty."""
+    if container.dtype == np.uint16:
+        if len(container) == 0:
+            return None
+        return to_bitset(container) if len(container) > ARRAY_LIMIT else container
+    count = int(np.bitwise_count(container).sum())
+    if count == 0:
+        return None
+    return to_array(container) if count <= ARRAY_LIMIT else container
+
+
+def cardinality(container):
+    if container.dtype == np.uint16:
+        return len(container)
+    return int(np.bitwise_count(container).sum())
+
+
+def intersect(a, b):
+    if a.dtype == np.uint16 and b.dtype == np.uint16:
+        return compact(np.intersect1d(a, b, assume_unique=True))
+    if a.dtype == np.uint16:
+        a, b = b, a
+    if b.dtype == np.uint16:
+        # Probe the sparse chunk's values against the dense one's bits
+        hit = (a[b >> 6] >> (b & 63).astype(np.uint64)) & np.uint64(1)
+        return compact(b[hit.astype(bool)])
+    return compact(a & b)
+
+
+def unite(containers):
+    if len(containers) == 1:
+        return containers[0]
+    if all(c.dtype == np.uint16 for c in containers) and sum(len(c) for c in containers) <= ARRAY_LIMIT:
+        return np.unique(np.concatenate(containers))
+    words = np.zeros(CHUNK_SIZE // 64, dtype=np.uint64)
+    for container in containers:
+        words |= to_bitset(container) if container.dtype == np.uint16 else container
+    return compact(words)
+
+
+class Bitmap:
+    """Compressed set of row positions in the Roaring layout.
+
+    Positions are split by their high 16 bits into chunks; each non-empty
+    chunk keeps its low 16 bits either as a sorted uint16 array (sparse) or
+    as a 1024-word uint64 bitset (dense), so a rare postcode costs two bytes
+    per order and a large state an eighth of a byte. AND and OR work chunk
+    by chunk on matching keys and never expand the whole set.
+    """
+
+    __slots__ = ('keys', 'containers')
+
+    def __init__(self, keys=(), containers=()):
+        self.keys = list(keys)
+        self.containers = list(containers)
+
+    @classmethod
+    def from_positions(cls, positions):
+        """Bitmap of sorted, unique row positions."""
+        positions = np.asarray(positions, dtype=np.int64)
+        high = positions >> CHUNK_BITS
+        starts = np.flatnonzero(np.r_[True, high[1:] != high[:-1]]) if len(positions) else []
+        bounds = list(starts) + [len(positions)]
+        keys, containers = [], []
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            keys.append(int(high[lo]))
+            containers.append(compact((positions[lo:hi] & (CHUNK_SIZE - 1)).astype(np.uint16)))
+        return cls(keys, containers)
+
+    def __len__(self):
+        return sum(cardinality(c) for c in self.containers)
+
+    def __and__(self, other):
+        other_containers = dict(zip(other.keys, other.containers))
+        keys, containers = [], []
+        for key, container in zip(self.keys, self.containers):
+            if key in other_containers:
+                both = intersect(container, other_containers[key])
+                if both is not None:
+                    keys.append(key)
+                    containers.append(both)
+        return Bitmap(keys, containers)
+
+    def __or__(self, other):
+        return Bitmap.union([self, other])
+
+    @staticmethod
+    def union(bitmaps):
+        """OR of any number of bitmaps, merging each chunk once."""
+        chunks = {}
+        for bitmap in bitmaps:
+            for key, container in zip(bitmap.keys, bitmap.containers):
+                chunks.setdefault(key, []).append(container)
+        keys = sorted(chunks)
+        return Bitmap(keys, [unite(chunks[key]) for key in keys])
+
+    def clip(self, lo, hi):
+        """The positions in the half-open range [lo, hi)."""
+        keys, containers = [], []
+        for key, container in zip(self.keys, self.containers):
+            start, stop = key << CHUNK_BITS, (key + 1) << CHUNK_BITS
+            if stop <= lo or start >= hi:
+                continue
+            if lo > start or hi < stop:
+                low = container if container.dtype == np.uint16 else to_array(container)
+                low = low[(low >= max(lo - start, 0)) & (low < min(hi - start, CHUNK_SIZE))]
+                container = compact(low)
+                if container is None:
+                    continue
+            keys.append(key)
+            containers.append(container)
+        return Bitmap(keys, containers)
+
+    def positions(self):
+        """Sorted row positions as an intp array."""
+        parts = [
+            (key << CHUNK_BITS) + (c if c.dtype == np.uint16 else to_array(c)).astype(np.intp)
+            for key, c in zip(self.keys, self.containers)
+        ]
+        return np.concatenate(parts) if parts else np.array([], dtype=np.intp)
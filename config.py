@@ -0,0 +1,76 @@
+import os
+
+# Dashboard settings, each overridable through an environment variable
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+ORDERS_SOURCE = os.environ.get(
+    "AU_ORDERS_SOURCE",
+    "https://raw.githubusercontent.com/lshawc/au-orders-dashboard/main/au_report.csv"
+)
+POSTCODES_SOURCE = os.environ.get(
+    "AU_POSTCODES_SOURCE",
+    "https://raw.githubusercontent.com/lshawc/au-orders-dashboard/main/postcode_data.csv"
+)
+
+# AU_ORDERS_SOURCE may also be a local directory or glob of CSV/Parquet shards;
+# changed shards are cleaned in parallel by up to this many processes (0: one per CPU)
+INGEST_WORKERS = int(os.environ.get("AU_ORDERS_INGEST_WORKERS", "0"))
+
+# Local directory holding the typed Parquet snapshots of the sources
+CACHE_DIR = os.environ.get("AU_ORDERS_CACHE_DIR", os.path.join(BASE_DIR, ".cache"))
+
+# Seconds between background checks of both sources for new data (0: only on "Refresh data")
+REFRESH_INTERVAL = int(os.environ.get("AU_ORDERS_REFRESH_SECONDS", "300"))
+
+# Most points the order map sends when its level of detail is "Auto"
+MAP_POINT_BUDGET = int(os.environ.get("AU_ORDERS_MAP_POINT_BUDGET", "1000"))
+
+# Most points a time-series chart draws before it is downsampled with LTTB
+TIMESERIES_POINT_BUDGET = int(os.environ.get("AU_ORDERS_TIMESERIES_POINTS", "500"))
+
+# Number of built chart figures kept for reuse across reruns and sessions
+FIGURE_CACHE_SIZE = int(os.environ.get("AU_ORDERS_FIGURE_CACHE_SIZE", "64"))
+
+
+class ConfigError(ValueError):
+    """A setting from the environment that cannot be used."""
+
+
+def parse_depots(setting):
+    """{name: postcode} from "name=postcode" pairs separated by ";"."""
+    depots = {}
+    for pair in setting.split(";"):
+        if not pair.strip():
+            continue
+        name, sep, postcode = pair.partition("=")
+        if not sep or not name.strip() or not postcode.strip().isdigit():
+            raise ConfigError(f'AU_ORDERS_DEPOTS: expected "name=postcode", got "{pair.strip()}"')
+        depots[name.strip()] = int(postcode)
+    return depots
+
+
+# Depots for the distance-to-depot metrics and radius filter, as "name=postcode"
+# pairs separated by ";" (each depot sits at its postcode's centroid)
+DEPOTS = parse_depots(os.environ.get(
+    "AU_ORDERS_DEPOTS", "Sydney=2000;Melbourne=3000;Brisbane=4000;Adelaide=5000;Perth=6000"
+))
+
+# Query engine behind the filters and aggregates: "pandas" (in memory), or an
+# embedded database file in CACHE_DIR: "sqlite" or "duckdb" (needs the duckdb package).
+# The frame is held in memory either way, and the database backends are not faster.
+QUERY_BACKENDS = ["pandas", "sqlite", "duckdb"]
+QUERY_BACKEND = os.environ.get("AU_ORDERS_QUERY_BACKEND", "pandas")
+if QUERY_BACKEND not in QUERY_BACKENDS:
+    raise ConfigError(f'AU_ORDERS_QUERY_BACKEND: expected one of {", ".join(QUERY_BACKENDS)}, got "{QUERY_BACKEND}"')
+
+# Per-section timings of each rerun: "1" shows them in a "Rerun profile" expander
+PROFILE_RERUNS = os.environ.get("AU_ORDERS_PROFILE", "0") == "1"
+# JSONL file the per-section timings are appended to, one line per section ("" disables)
+METRICS_FILE = os.environ.get("AU_ORDERS_METRICS_FILE", "")
+
+# Headless JSON API (python api.py): address to listen on, bearer token required
+# in the Authorization header ("" allows any caller; loopback hosts only) and cached responses kept
+API_HOST = os.environ.get("AU_ORDERS_API_HOST", "127.0.0.1")
+API_PORT = int(os.environ.get("AU_ORDERS_API_PORT", "8502"))
+API_TOKEN = os.environ.get("AU_ORDERS_API_TOKEN", "")
+API_CACHE_SIZE = int(os.environ.get("AU_ORDERS_API_CACHE_SIZE", "256"))
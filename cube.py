@@ -0,0 +1,114 @@
+import pandas as pd
+
+from loader import concat_orders
+from topk import CountPartials, top_k
+
+CUBE_KEYS = ['State', 'Day', 'PostalCode', 'PostcodeKey']
+
+
+def count_orders(df):
+    """Collapse order rows to counts per (State, Day, PostalCode), sorted by Day.
+
+    PostcodeKey depends only on PostalCode, so carrying it does not split keys.
+    """
+    counts = df.groupby(
+        [df['State'], df['OrderDate'].dt.normalize().rename('Day'), df['PostalCode'], df['PostcodeKey']],
+        observed=True
+    ).size().reset_index(name='OrderCount')
+    return counts.sort_values('Day', kind='stable', ignore_index=True)
+
+
+class OrderCube:
+    """Pre-aggregated order counts keyed by (State, Day, PostalCode).
+
+    The Summary metrics, Top tables and charts are answered from these
+    counts, so their cost depends on the number of distinct keys rather than
+    the number of orders. Rows stay sorted by Day so a date range is a
+    contiguous slice. The full cube also keeps per-month partials, and a
+    slice of it answers its postcode-level queries from them.
+    """
+
+    def __init__(self, counts=None, selected=None):
+        self.counts = counts
+        self.partials = None
+        # SelectedCounts for a slice of a cube with partials
+        self.selected = selected
+
+    @classmethod
+    def from_orders(cls, df):
+        cube = cls()
+        cube.rebuild(df)
+        return cube
+
+    def rebuild(self, df):
+        self.counts = count_orders(df)
+        self.partials = CountPartials(self.counts)
+
+    def copy(self):
+        """A cube over the same counts that ``append`` can extend without changing this one."""
+        cube = OrderCube(self.counts, self.selected)
+        cube.partials = self.partials
+        return cube
+
+    def append(self, df):
+        """Fold newly ingested order rows into the existing counts."""
+        if df.empty:
+            return
+        counts = concat_orders([self.counts, count_orders(df)])
+        counts = counts.groupby(CUBE_KEYS, observed=True)['OrderCount'].sum().reset_index()
+        self.counts = counts.sort_values('Day', kind='stable', ignore_index=True)
+        self.partials = CountPartials(self.counts)
+
+    def slice(self, states=None, start_date=None, end_date=None, postcode_keys=None):
+        """Sub-cube for any of ``states`` and ``postcode_keys`` (None for all) and an inclusive date range."""
+        counts = self.counts
+        if start_date is not None or end_date is not None:
+            days = counts['Day'].values
+            lo = days.searchsorted(pd.Timestamp(start_date).to_datetime64()) if start_date is not None else 0
+            hi = days.searchsorted(pd.Timestamp(end_date).to_datetime64(), side='right') if end_date is not None else len(days)
+            counts = counts.iloc[lo:hi]
+        if states is not None:
+            counts = counts[counts['State'].isin(states)]
+        if postcode_keys is not None:
+            counts = counts[counts['PostcodeKey'].isin(postcode_keys)]
+        selected = self.partials.select(states, start_date, end_date, postcode_keys) if self.partials else None
+        return OrderCube(counts, selected)
+
+    def total(self):
+        return int(self.counts['OrderCount'].sum())
+
+    def state_counts(self):
+        """Orders per State, largest first (like ``value_counts``)."""
+        counts = self.counts.groupby('State', observed=True)['OrderCount'].sum()
+        return counts.sort_values(ascending=False).reset_index()
+
+    def postcode_state_counts(self):
+        if self.selected is not None:
+            return self.selected.postcode_state_counts()
+        return self.counts.groupby(['PostalCode', 'State'], observed=True)['OrderCount'].sum().reset_index()
+
+    def top_postcodes(self, k):
+        """The ``k`` (PostalCode, State) pairs with the most orders, largest first."""
+        if self.selected is not None:
+            return self.selected.top_postcodes(k)
+        return top_k(self.postcode_state_counts(), k)
+
+    def postcode_counts(self):
+        if self.selected is not None:
+            return self.selected.postcode_counts()
+        return self.counts.groupby(['PostalCode', 'PostcodeKey'])['OrderCount'].sum().reset_index()
+
+    def day_counts(self):
+        """(Day, OrderCount) rows in Day order; a day may span several rows."""
+        return self.counts[['Day', 'OrderCount']]
+
+    def monthly_counts(self):
+        """Orders per calendar month, with the month as a Period in ``OrderDate``."""
+        months = self.counts['Day'].dt.to_period('M').rename('OrderDate')
+        return self.counts.groupby(months)['OrderCount'].sum().reset_index()
+
+    def state_monthly_counts(self):
+        months = self.counts['Day'].dt.to_period('M').rename('OrderDate')
+        return self.counts.groupby(
+            [self.counts['State'], months], observed=True
+        )['OrderCount'].sum().reset_index()
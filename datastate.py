@@ -0,0 +1,172 @@
+import os
+from collections import namedtuple
+from functools import partial
+from io import StringIO
+
+import pandas as pd
+
+from backends import PandasBackend, SqlStore
+from config import CACHE_DIR, DEPOTS, INGEST_WORKERS, ORDERS_SOURCE, POSTCODES_SOURCE, QUERY_BACKEND, REFRESH_INTERVAL
+from cube import OrderCube
+from filters import Filters, OrderIndex
+from loader import DataError, clean_postcodes, order_snapshot, postcode_snapshot, representatives
+from mapgrid import MapGrid
+from pager import OrderPager
+from postcodes import PostcodeDimension
+from refresher import Refresher
+from search import MATCH_MODES, OrderIdIndex
+from spatial import DepotIndex, PostcodeTree
+
+# Used when the postcode source cannot be read at all
+SAMPLE_POSTCODES_CSV = """postcode,place_name,state_name,state_code,latitude,longitude,accuracy
+200,Australian National University,Australian Capital Territory,ACT,-35.2777,149.1189,1
+221,Barton,Australian Capital Territory,ACT,-35.3049,149.1412,4
+2540,Jervis Bay,Australian Capital Territory,ACT,-35.1333,150.7,4
+2600,Deakin West,Australian Capital Territory,ACT,-35.3126,149.1278,3
+2000,Sydney,New South Wales,NSW,-33.8688,151.2093,4
+2010,Surry Hills,New South Wales,NSW,-33.8792,151.2070,4
+3000,Melbourne,Victoria,VIC,-37.8136,144.9631,4
+3001,Melbourne,Victoria,VIC,-37.8136,144.9631,4
+"""
+
+# One consistent version of everything a rerun reads; the refresher swaps it in whole
+DataState = namedtuple('DataState', [
+    'version', 'orders_version', 'postcodes_version', 'df', 'order_warnings', 'postcode_warnings', 'appended',
+    'postcodes', 'map_grid', 'postcode_tree', 'depots', 'cube', 'index', 'search_index', 'pager', 'sql_backend'
+])
+
+
+def build_data_state(orders, postcodes_snapshot, previous):
+    """Check both snapshots and build the next DataState, or return ``previous`` if neither changed.
+
+    Runs on the refresher's thread: the frame is one read-only object shared by
+    every session. Rows appended after the existing ones are folded into copies
+    of the previous version's cube and indexes (or a new generation of its
+    database table), and anything else rebuilds them in full, so the state
+    being served is never modified.
+    """
+    try:
+        df, order_warnings = orders.load()
+    except DataError:
+        raise
+    except Exception as e:
+        raise DataError(f"Could not load order data from {ORDERS_SOURCE}: {str(e)}") from e
+    try:
+        localities, postcode_warnings = postcodes_snapshot.load()
+        postcodes_version = postcodes_snapshot.version
+    except DataError:
+        raise
+    except Exception:
+        localities = None
+        postcodes_version = previous.postcodes_version if previous is not None else -1
+    if (previous is not None and previous.orders_version == orders.version
+            and previous.postcodes_version == postcodes_version):
+        return previous
+
+    if previous is not None and previous.postcodes_version == postcodes_version:
+        postcodes, map_grid, postcode_tree, depots = (
+            previous.postcodes, previous.map_grid, previous.postcode_tree, previous.depots
+        )
+        postcode_warnings = previous.postcode_warnings
+    else:
+        if localities is None:
+            localities, postcode_warnings = clean_postcodes(pd.read_csv(StringIO(SAMPLE_POSTCODES_CSV)))
+            postcode_warnings = ["Postcode data not found. Using sample data."] + postcode_warnings
+        postcodes = PostcodeDimension(representatives(localities))
+        map_grid = MapGrid(postcodes)
+        postcode_tree = PostcodeTree(postcodes)
+        depots = DepotIndex(postcodes, DEPOTS)
+
+    cube = index = search_index = pager = sql_backend = None
+    if QUERY_BACKEND == "pandas":
+        if previous is not None and previous.orders_version == orders.version:
+            cube, index, search_index, pager = previous.cube, previous.index, previous.search_index, previous.pager
+        elif (previous is not None and previous.cube is not None and orders.appended is not None
+                and orders.appended_at_end and len(previous.df) + len(orders.appended) == len(df)):
+            # Rows appended after the previous version are folded into copies of its
+            # aggregates, so the state being served is not modified
+            cube, index, search_index, pager = (
+                previous.cube.copy(), previous.index.copy(), previous.search_index.copy(), previous.pager.copy()
+            )
+            for aggregate in (cube, index, search_index, pager):
+                aggregate.append(orders.appended)
+        else:
+            cube, index, search_index, pager = OrderCube(), OrderIndex(), OrderIdIndex(), OrderPager()
+            for aggregate in (cube, index, search_index, pager):
+                aggregate.rebuild(df)
+    else:
+        # Each version reads its own generation of the database's orders table
+        last = previous.sql_backend if previous is not None else None
+        try:
+            if last is not None:
+                store = last.store
+            else:
+                os.makedirs(CACHE_DIR, exist_ok=True)
+                store = SqlStore(CACHE_DIR, QUERY_BACKEND, orders.stamp)
+            if last is not None and previous.orders_version == orders.version:
+                sql_backend = last
+            elif (last is not None and orders.appended is not None and orders.appended_at_end
+                    and last.row_count + len(orders.appended) == len(df)):
+                sql_backend = store.append(last, orders.appended)
+            if sql_backend is None:
+                sql_backend = store.load(df)
+        except Exception as e:
+            raise DataError(f"Could not load the {QUERY_BACKEND} query backend: {str(e)}") from e
+    return DataState(
+        version=previous.version + 1 if previous is not None else 1,
+        orders_version=orders.version,
+        postcodes_version=postcodes_version,
+        df=df,
+        order_warnings=order_warnings,
+        postcode_warnings=postcode_warnings,
+        appended=orders.appended,
+        postcodes=postcodes,
+        map_grid=map_grid,
+        postcode_tree=postcode_tree,
+        depots=depots,
+        cube=cube,
+        index=index,
+        search_index=search_index,
+        pager=pager,
+        sql_backend=sql_backend,
+    )
+
+
+def data_refresher():
+    """A started Refresher over the configured order and postcode sources.
+
+    The snapshots live with it, so refreshes only ingest newly appended order rows.
+    """
+    build = partial(
+        build_data_state,
+        order_snapshot(ORDERS_SOURCE, CACHE_DIR, INGEST_WORKERS),
+        postcode_snapshot(POSTCODES_SOURCE, CACHE_DIR),
+    )
+    refresher = Refresher(build, REFRESH_INTERVAL)
+    refresher.refresh()
+    return refresher.start()
+
+
+def query_backend(state):
+    """The backend answering filters and aggregates for a DataState."""
+    if QUERY_BACKEND == "pandas":
+        return PandasBackend(state.df, state.cube, state.index, state.search_index, state.pager, state.version)
+    return state.sql_backend
+
+
+def selection_filters(state, states=(), postcode_keys=(), near_postcode=None, radius_km=25, start_date=None,
+                      end_date=None, order_id="", order_id_mode=MATCH_MODES[0]):
+    """Filters for a sidebar-style selection.
+
+    Empty ``states`` or ``postcode_keys`` do not restrict; a ``near_postcode``
+    narrows the postcodes to those within ``radius_km`` of it.
+    """
+    selected_postcodes = set(postcode_keys) if postcode_keys else None
+    if near_postcode is not None:
+        nearby = set(state.postcode_tree.within(near_postcode, radius_km).tolist())
+        selected_postcodes = nearby if selected_postcodes is None else selected_postcodes & nearby
+    return Filters(
+        tuple(states) or None,
+        tuple(sorted(selected_postcodes)) if selected_postcodes is not None else None,
+        start_date, end_date, order_id, order_id_mode
+    )
@@ -0,0 +1,31 @@
+from io import BytesIO
+
+# Download formats: file name and MIME type
+EXPORT_FORMATS = {
+    "CSV": ("au_orders_filtered.csv", "text/csv"),
+    "CSV (gzip)": ("au_orders_filtered.csv.gz", "application/gzip"),
+    "Parquet": ("au_orders_filtered.parquet", "application/vnd.apache.parquet"),
+}
+
+
+def export_columns(df):
+    """The order columns as they appear in the source, without internal lookup keys."""
+    return df[[col for col in df.columns if col != 'PostcodeKey']]
+
+
+def export_bytes(df, fmt):
+    """``df`` encoded in one of EXPORT_FORMATS.
+
+    Streamlit holds a download's whole body as bytes, so the file is written
+    straight into one buffer (pandas encodes CSV a block of rows at a time)
+    and handed over by ``getvalue``, which does not copy it.
+    """
+    df = export_columns(df)
+    out = BytesIO()
+    if fmt == "Parquet":
+        df.to_parquet(out, index=False)
+    elif fmt == "CSV (gzip)":
+        df.to_csv(out, index=False, compression='gzip')
+    else:
+        df.to_csv(out, index=False)
+    return out.getvalue()
@@ -0,0 +1,148 @@
+import threading
+from collections import OrderedDict
+
+import plotly.express as px
+import plotly.graph_objects as go
+
+
+def apply_theme(fig, is_light_mode):
+    """Apply the light or dark colours to a figure in place and return it."""
+    if is_light_mode:
+        layout = dict(font=dict(color="#000000"), paper_bgcolor="#ffffff", plot_bgcolor="#ffffff")
+    else:
+        layout = dict(font=dict(color="#ffffff"), paper_bgcolor="#222222", plot_bgcolor="#222222")
+    if any(trace.type == 'scattermapbox' for trace in fig.data):
+        layout['mapbox_style'] = "carto-positron" if is_light_mode else "carto-darkmatter"
+    fig.update_layout(**layout)
+    return fig
+
+
+def map_figure(map_data):
+    fig = px.scatter_mapbox(
+        map_data,
+        lat='latitude',
+        lon='longitude',
+        size='OrderCount',
+        color='OrderCount',
+        color_continuous_scale='Blues',
+        hover_data=['PostalCode', 'state_name', 'place_name', 'Postcodes', 'OrderCount'],
+        title="Orders by Postal Code",
+        size_max=30,
+        zoom=3,
+        center={"lat": -25.2744, "lon": 133.7751}
+    )
+    fig.update_layout(
+        margin={"r":0, "t":0, "l":0, "b":0},
+        coloraxis_colorbar_title="Orders"
+    )
+    return fig
+
+
+def postcode_scatter_figure(postal_counts):
+    """Fallback for the map when no postcode has lat/lon data."""
+    fig = px.scatter(
+        postal_counts,
+        x='PostalCode',
+        y='OrderCount',
+        size='OrderCount',
+        hover_data=['PostalCode'],
+        title="Orders by Postal Code (No Lat/Lon Data)",
+        labels={'OrderCount': 'Number of Orders'},
+        color_discrete_sequence=['#1976d2']
+    )
+    fig.update_layout(showlegend=False)
+    return fig
+
+
+def state_bar_figure(state_counts):
+    fig = px.bar(
+        state_counts,
+        x='State',
+        y='OrderCount',
+        color='State',
+        color_discrete_sequence=px.colors.sequential.Blues[::-1],
+        title="Orders by State",
+        labels={'OrderCount': 'Number of Orders'}
+    )
+    fig.update_layout(showlegend=False)
+    return fig
+
+
+def orders_over_time_figure(series, granularity="Monthly"):
+    fig = px.line(
+        series,
+        x='Period',
+        y='OrderCount',
+        title="Orders Over Time",
+        labels={'OrderCount': 'Number of Orders', 'Period': {"Daily": "Day", "Weekly": "Week"}.get(granularity, "Month")},
+        color_discrete_sequence=['#1976d2']
+    )
+    # Markers only while they stay readable
+    fig.update_traces(mode='lines+markers' if len(series) <= 200 else 'lines')
+    return fig
+
+
+def state_mom_figure(state_mom_data):
+    fig = px.line(
+        state_mom_data,
+        x='OrderDate',
+        y='MoM_Change',
+        color='State',
+        title="Month-over-Month Growth by State (%)",
+        labels={'MoM_Change': 'MoM Change (%)', 'OrderDate': 'Month'},
+        color_discrete_sequence=px.colors.sequential.Blues[::-1]
+    )
+    fig.update_traces(mode='lines+markers')
+    fig.update_layout(showlegend=True)
+    return fig
+
+
+def mom_figure(mom_data):
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=mom_data['OrderDate'].astype(str),
+        y=mom_data['MoM_Change'].where(mom_data['MoM_Change'] >= 0),
+        mode='lines+markers',
+        name='Growth',
+        line=dict(color='#388e3c')
+    ))
+    fig.add_trace(go.Scatter(
+        x=mom_data['OrderDate'].astype(str),
+        y=mom_data['MoM_Change'].where(mom_data['MoM_Change'] < 0),
+        mode='lines+markers',
+        name='Loss',
+        line=dict(color='#d32f2f')
+    ))
+    fig.update_layout(
+        title="Month-over-Month Growth/Loss (%)",
+        xaxis_title="Month",
+        yaxis_title="MoM Change (%)",
+        showlegend=True
+    )
+    return fig
+
+
+class FigureCache:
+    """LRU cache of un-themed Plotly figures keyed by the filters and data version behind them.
+
+    ``get`` returns a copy with the theme applied, so a theme switch reuses the
+    cached traces and only re-applies the layout colours.
+    """
+
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self.figures = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, build, is_light_mode):
+        with self.lock:
+            fig = self.figures.get(key)
+            if fig is not None:
+                self.figures.move_to_end(key)
+        if fig is None:
+            fig = build()
+            with self.lock:
+                self.figures[key] = fig
+                while len(self.figures) > self.maxsize:
+                    self.figures.popitem(last=False)
+        return apply_theme(go.Figure(fig), is_light_mode)
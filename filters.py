@@ -0,0 +1,117 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from bitmaps import Bitmap
+
+# The sidebar selection: States and PostcodeKeys (tuples, None for no restriction),
+# inclusive date range and OrderID search
+Filters = namedtuple('Filters', ['states', 'postcode_keys', 'start_date', 'end_date', 'order_id', 'order_id_mode'])
+
+
+def to_day(value):
+    """Day number (days since 1970-01-01) of a date or datetime."""
+    return np.datetime64(value, 'D').astype(np.int64)
+
+
+def day_numbers(dates):
+    """int32 day numbers of a datetime64 column: half the size of the dates themselves."""
+    return dates.to_numpy(dtype='datetime64[ns]').astype('datetime64[D]').astype(np.int32)
+
+
+class OrderIndex:
+    """Row-position index over an order frame sorted by OrderDate.
+
+    A date range resolves to a contiguous slice with ``searchsorted`` (months
+    and days are already runs of rows, so they need no bitmaps), and each
+    State and PostcodeKey keeps a compressed bitmap of its rows. Any mix of
+    multi-selects is an OR of bitmaps within a dimension and an AND across
+    dimensions, clipped to the date range, rather than boolean masks over
+    the frame.
+    """
+
+    def __init__(self, df=None):
+        self.days = np.array([], dtype=np.int32)
+        self.state_bitmaps = {}
+        self.postcode_bitmaps = {}
+        if df is not None:
+            self.rebuild(df)
+
+    def __len__(self):
+        return len(self.days)
+
+    def rebuild(self, df):
+        self.days = day_numbers(df['OrderDate'])
+        self.state_bitmaps = self.group_bitmaps(df['State'], 0)
+        self.postcode_bitmaps = self.group_bitmaps(df['PostcodeKey'], 0)
+
+    def copy(self):
+        """An index sharing this one's arrays and bitmaps that ``append`` can extend without changing this one."""
+        index = OrderIndex()
+        index.days = self.days
+        index.state_bitmaps = dict(self.state_bitmaps)
+        index.postcode_bitmaps = dict(self.postcode_bitmaps)
+        return index
+
+    def append(self, rows):
+        """Extend the index with rows appended after the last indexed position."""
+        offset = len(self.days)
+        self.days = np.concatenate([self.days, day_numbers(rows['OrderDate'])])
+        for bitmaps, column in ((self.state_bitmaps, 'State'), (self.postcode_bitmaps, 'PostcodeKey')):
+            for value, bitmap in self.group_bitmaps(rows[column], offset).items():
+                existing = bitmaps.get(value)
+                bitmaps[value] = bitmap if existing is None else existing | bitmap
+
+    @staticmethod
+    def group_bitmaps(values, offset):
+        """{value: Bitmap of its row positions + offset}, from one stable sort."""
+        codes, uniques = pd.factorize(values, sort=True)
+        order = np.argsort(codes, kind='stable')
+        bounds = np.concatenate([[0], np.cumsum(np.bincount(codes[codes >= 0], minlength=len(uniques)))])
+        # Missing values (code -1) sort first and belong to no bitmap
+        order = order[len(codes) - bounds[-1]:]
+        return {
+            value: Bitmap.from_positions(order[bounds[i]:bounds[i + 1]] + offset)
+            for i, value in enumerate(uniques.tolist())
+            if bounds[i + 1] > bounds[i]
+        }
+
+    def min_date(self):
+        return np.datetime64(int(self.days[0]), 'D').astype(object)
+
+    def max_date(self):
+        return np.datetime64(int(self.days[-1]), 'D').astype(object)
+
+    def date_bounds(self, start_date=None, end_date=None):
+        """Half-open [lo, hi) row range for an inclusive date range."""
+        lo = self.days.searchsorted(to_day(start_date)) if start_date is not None else 0
+        hi = self.days.searchsorted(to_day(end_date), side='right') if end_date is not None else len(self.days)
+        return lo, hi
+
+    def selection(self, bitmaps, values):
+        return Bitmap.union([bitmaps[value] for value in values if value in bitmaps])
+
+    def positions(self, states=None, postcode_keys=None, start_date=None, end_date=None):
+        """Row positions matching any of ``states``, any of ``postcode_keys`` and a date range.
+
+        None leaves a dimension unrestricted. Returns a ``slice`` when only the
+        date range applies, otherwise a sorted array.
+        """
+        lo, hi = self.date_bounds(start_date, end_date)
+        selected = None
+        for bitmaps, values in ((self.state_bitmaps, states), (self.postcode_bitmaps, postcode_keys)):
+            if values is not None:
+                bitmap = self.selection(bitmaps, values)
+                selected = bitmap if selected is None else selected & bitmap
+        if selected is None:
+            return slice(lo, hi)
+        return selected.clip(lo, hi).positions()
+
+
+def restrict(positions, matches):
+    """Keep the sorted row positions in ``matches`` that fall within ``positions``."""
+    if isinstance(positions, slice):
+        lo, hi = matches.searchsorted([positions.start, positions.stop])
+        return matches[lo:hi]
+    return np.intersect1d(positions, matches, assume_unique=True)
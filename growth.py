@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+
+
+def group_starts(groups, n):
+    """Boolean mask marking the first row of each run of equal group keys."""
+    starts = np.zeros(n, dtype=bool)
+    starts[:1] = True
+    if groups is not None:
+        starts[1:] = groups[1:] != groups[:-1]
+    return starts
+
+
+def percent_change(current, previous):
+    """(current / previous - 1) * 100, with NaN and +/-inf results reported as 0."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = current / previous - 1
+    return np.where(np.isfinite(ratio), ratio * 100, 0.0)
+
+
+def mom_change(values, groups=None):
+    """Change against the previous row of the same group, in percent."""
+    values = np.asarray(values, dtype=float)
+    previous = np.roll(values, 1)
+    previous[group_starts(groups, len(values))] = np.nan
+    return percent_change(values, previous)
+
+
+def yoy_change(values, months, groups=None):
+    """Change against the same calendar month a year earlier, in percent.
+
+    ``months`` are integer month ordinals; rows without a match twelve
+    months back report 0.
+    """
+    values = np.asarray(values, dtype=float)
+    months = np.asarray(months, dtype=np.int64)
+    groups = np.zeros(len(values), dtype=np.int64) if groups is None else np.asarray(groups)
+    keys = groups.astype(np.int64) * (1 << 32) + months
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    slots = sorted_keys.searchsorted(keys - 12)
+    found = (slots < len(keys)) & (sorted_keys[np.minimum(slots, len(keys) - 1)] == keys - 12)
+    previous = np.full(len(values), np.nan)
+    previous[found] = values[order[slots[found]]]
+    return percent_change(values, previous)
+
+
+def cumulative(values, groups=None):
+    """Running total that restarts at each group."""
+    values = np.asarray(values, dtype=float)
+    totals = np.cumsum(values)
+    starts = np.flatnonzero(group_starts(groups, len(values)))
+    offsets = np.repeat(totals[starts] - values[starts], np.diff(np.append(starts, len(values))))
+    return totals - offsets
+
+
+def rolling_mean(values, window=3, groups=None):
+    """Trailing mean over up to ``window`` rows of the same group."""
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    totals = np.concatenate([[0.0], np.cumsum(values)])
+    starts = np.flatnonzero(group_starts(groups, n))
+    group_start = np.repeat(starts, np.diff(np.append(starts, n)))
+    positions = np.arange(n)
+    lo = np.maximum(positions - window + 1, group_start)
+    return (totals[positions + 1] - totals[lo]) / (positions + 1 - lo)
+
+
+def growth_table(counts, value='OrderCount', period='OrderDate', by=None, window=3):
+    """Add MoM_Change, YoY_Change, Rolling_Avg and Cumulative columns to monthly counts.
+
+    ``counts`` holds one row per month (per ``by`` group), sorted by month
+    within each group, with monthly Periods in ``period``. All results are
+    numeric; formatting is left to the display layer.
+    """
+    counts = counts.copy()
+    groups = pd.factorize(counts[by])[0] if by is not None else None
+    values = counts[value].to_numpy(dtype=float)
+    months = pd.PeriodIndex(counts[period], freq='M').asi8
+    counts['MoM_Change'] = mom_change(values, groups)
+    counts['YoY_Change'] = yoy_change(values, months, groups)
+    counts['Rolling_Avg'] = rolling_mean(values, window, groups)
+    counts['Cumulative'] = cumulative(values, groups)
+    return counts
@@ -0,0 +1,545 @@
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import urllib.request
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from postcodes import postcode_keys, representative_mask
+
+ORDER_COLUMNS = ['OrderID', 'OrderDate', 'PostalCode', 'State']
+# Low-cardinality order columns held as categoricals (a small integer code per row)
+CATEGORY_COLUMNS = ['State', 'PostalCode']
+POSTCODE_COLUMNS = ['postcode', 'place_name', 'state_name', 'state_code']
+SHARD_EXTENSIONS = ('.csv', '.csv.gz', '.parquet')
+
+
+class DataError(Exception):
+    """Raised when a source cannot be turned into a usable table."""
+
+
+def is_url(source):
+    return source.startswith(("http://", "https://"))
+
+
+def postal_code_column(values):
+    """PostalCode as a categorical, numeric codes zero-padded to four digits ("800" -> "0800").
+
+    Only the distinct labels are padded, so the cost does not grow with the rows.
+    """
+    codes, labels = pd.factorize(values.astype(str))
+    labels = pd.Series(labels, dtype=str)
+    labels = labels.where(~labels.str.fullmatch(r'\d{1,3}'), labels.str.zfill(4))
+    label_codes, categories = pd.factorize(labels, sort=True)
+    return pd.Categorical.from_codes(label_codes[codes], categories)
+
+
+def concat_orders(frames):
+    """Concatenate order frames, keeping the categorical columns categorical over all their labels."""
+    frames = [df.astype({col: 'category' for col in CATEGORY_COLUMNS if col in df.columns}) for df in frames]
+    for col in CATEGORY_COLUMNS:
+        if all(col in df.columns for df in frames):
+            categories = union_categoricals([df[col] for df in frames], sort_categories=True).categories
+            frames = [df.assign(**{col: df[col].cat.set_categories(categories)}) for df in frames]
+    return pd.concat(frames, ignore_index=True)
+
+
+def clean_order_rows(df):
+    """Coerce dates and fill missing states; returns the kept rows and how many were dropped."""
+    df['OrderDate'] = pd.to_datetime(df['OrderDate'], format='%Y-%m-%d', errors='coerce')
+    df['State'] = df['State'].fillna('Unknown')
+    initial_len = len(df)
+    df = df.dropna(subset=['OrderDate'])
+    df = df.astype({'OrderID': str, 'State': 'category'})
+    df['PostalCode'] = postal_code_column(df['PostalCode'])
+    # Keys are parsed once per distinct postcode and gathered by category code
+    df['PostcodeKey'] = postcode_keys(df['PostalCode'].cat.categories).to_numpy()[df['PostalCode'].cat.codes]
+    df = df.sort_values('OrderDate', kind='stable', ignore_index=True)
+    return df, initial_len - len(df)
+
+
+def order_warnings(dropped, has_au_prefix):
+    warnings = []
+    if dropped:
+        warnings.append(f"Removed {dropped} rows with invalid OrderDate values.")
+    if not has_au_prefix:
+        warnings.append("No OrderIDs start with 'AU'. Expected from query WHERE ID LIKE 'AU%'.")
+    return warnings
+
+
+def check_order_columns(df):
+    missing_cols = [col for col in ORDER_COLUMNS if col not in df.columns]
+    if missing_cols:
+        raise DataError(f"Missing columns: {', '.join(missing_cols)}. Available: {', '.join(df.columns)}")
+
+
+def clean_orders(df):
+    """Apply the dashboard's cleaning rules to raw order rows.
+
+    Returns the cleaned frame and a list of warning messages. State and
+    PostalCode are kept as categoricals, OrderID as a (pyarrow-backed) string
+    and OrderDate as datetime64 so the frame stores compactly, PostcodeKey
+    holds the postcode as int16 for reference-data lookups, and rows are
+    sorted by OrderDate (stable) so date ranges are contiguous.
+    """
+    check_order_columns(df)
+    df, dropped = clean_order_rows(df)
+    if df.empty:
+        raise DataError("No valid OrderDate values after cleaning.")
+    return df, order_warnings(dropped, df['OrderID'].str.startswith('AU').any())
+
+
+def clean_postcodes(df):
+    """Key postcode localities by integer postcode and flag one representative per postcode.
+
+    Every locality is kept, with ``representative`` marking the row the
+    dashboard uses for the postcode; see ``representatives``.
+    """
+    missing_cols = [col for col in POSTCODE_COLUMNS if col not in df.columns]
+    if missing_cols:
+        raise DataError(f"Postcode CSV missing columns: {', '.join(missing_cols)}")
+    df['PostcodeKey'] = postcode_keys(df['postcode']).to_numpy()
+    df['postcode'] = df['postcode'].astype(str)
+    df['representative'] = representative_mask(df)
+    df = df.sort_values(['PostcodeKey', 'representative'], ascending=[True, False], kind='stable', ignore_index=True)
+    warnings = []
+    picked = df[df['representative']]
+    invalid = picked[['latitude', 'longitude']].isna().any(axis=1).sum() if 'latitude' in df.columns else 0
+    if invalid:
+        warnings.append(f"Removed {invalid} rows with invalid lat/lon values.")
+    return df, warnings
+
+
+def representatives(localities):
+    """One row per postcode: the representative locality, restricted to rows with coordinates."""
+    postcode_df = localities[localities['representative']]
+    return postcode_df.dropna(subset=['latitude', 'longitude']).reset_index(drop=True)
+
+
+def is_sharded(source):
+    """True for a local directory or glob pattern of order shards rather than a single file or URL."""
+    return not is_url(source) and (os.path.isdir(source) or glob.has_magic(source))
+
+
+def shard_paths(source):
+    """Sorted CSV/Parquet shard files in a directory, or matching a glob pattern."""
+    if os.path.isdir(source):
+        paths = [os.path.join(source, name) for name in os.listdir(source)]
+    else:
+        paths = glob.glob(source)
+    return sorted(path for path in paths if path.endswith(SHARD_EXTENSIONS) and os.path.isfile(path))
+
+
+def clean_shard(path):
+    """Read and clean one order shard; returns (frame, dropped rows). Runs in a worker process."""
+    raw_df = pd.read_parquet(path) if path.endswith('.parquet') else pd.read_csv(path)
+    try:
+        check_order_columns(raw_df)
+    except DataError as e:
+        raise DataError(f"{os.path.basename(path)}: {e}") from None
+    return clean_order_rows(raw_df)
+
+
+def source_fingerprint(source, timeout=5):
+    """Cheap change marker for a source: ETag/Last-Modified for URLs, mtime and size for files.
+
+    Returns None when the source cannot be reached or gives no usable header.
+    """
+    if not is_url(source):
+        try:
+            stat = os.stat(source)
+        except OSError:
+            return None
+        return f"mtime:{stat.st_mtime_ns}:{stat.st_size}"
+    request = urllib.request.Request(source, method="HEAD")
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            etag = response.headers.get("ETag")
+            if etag:
+                return f"etag:{etag}"
+            modified = response.headers.get("Last-Modified")
+            if modified:
+                return f"modified:{modified}:{response.headers.get('Content-Length')}"
+    except OSError:
+        pass
+    return None
+
+
+def read_source_bytes(source, start=0, timeout=5):
+    """Read a source from byte ``start`` onwards.
+
+    Returns (data, data_start): URLs are fetched with a Range request, and
+    data_start is 0 when the server ignored the range and sent everything.
+    """
+    if is_url(source):
+        request = urllib.request.Request(source)
+        if start:
+            request.add_header("Range", f"bytes={start}-")
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.read(), start if response.status == 206 else 0
+    with open(source, "rb") as f:
+        f.seek(start)
+        return f.read(), start
+
+
+def read_csv_bytes(raw):
+    return pd.read_csv(BytesIO(raw))
+
+
+class Snapshot:
+    """Typed Parquet copy of a cleaned CSV source, kept under ``cache_dir/name``.
+
+    The snapshot is rebuilt only when the source fingerprint changes and the
+    downloaded content hash differs from the one it was built from, so a warm
+    start reads Parquet without touching the network. If the source cannot be
+    reached, an existing snapshot is served as-is.
+    """
+
+    # Bumped whenever the stored frame's layout changes, forcing a rebuild
+    SCHEMA = 1
+
+    def __init__(self, source, cache_dir, name, clean):
+        self.source = source
+        self.clean = clean
+        self.path = os.path.join(cache_dir, name)
+        self.meta_path = os.path.join(self.path, "meta.json")
+        self.frame = None
+        self.warnings = []
+        self.meta = None
+        self.appended = None
+        self.appended_at_end = True
+        # Bumped every time the in-memory frame changes
+        self.version = 0
+        self.lock = threading.Lock()
+
+    def read_meta(self):
+        try:
+            with open(self.meta_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def write_meta(self, meta):
+        tmp_path = f"{self.meta_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self.meta_path)
+        self.meta = meta
+
+    def read_frame(self, meta):
+        frames = [pd.read_parquet(os.path.join(self.path, part)) for part in meta["parts"]]
+        return self.combine(frames)
+
+    def combine(self, frames):
+        return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+    def write_part(self, df):
+        """Write ``df`` as a new part; names are never reused, so no part a meta lists is overwritten."""
+        return self.write_part_as(df, f"part-{uuid.uuid4().hex[:12]}.parquet")
+
+    def write_part_as(self, df, part):
+        # Per process, so a dashboard and an API process sharing the cache do not collide
+        tmp_path = os.path.join(self.path, f"{part}.{os.getpid()}.tmp")
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, os.path.join(self.path, part))
+        return part
+
+    def remove_parts(self, parts):
+        """Delete parts the meta no longer lists (only once the new meta is written)."""
+        for part in parts:
+            try:
+                os.remove(os.path.join(self.path, part))
+            except OSError:
+                pass
+
+    def set_frame(self, df, warnings):
+        self.frame = df
+        self.warnings = warnings
+        return df, warnings
+
+    def load_snapshot(self, meta):
+        try:
+            return self.set_frame(self.read_frame(meta), meta.get("warnings", []))
+        except Exception:
+            return None
+
+    def rebuild(self, fingerprint):
+        raw, _ = read_source_bytes(self.source)
+        content_hash = hashlib.sha256(raw).hexdigest()
+        meta = self.meta
+        if meta is not None and content_hash == meta.get("content_hash"):
+            loaded = (self.frame, self.warnings) if self.frame is not None else self.load_snapshot(meta)
+            if loaded is not None:
+                self.write_meta(dict(meta, fingerprint=fingerprint))
+                return loaded
+        raw_df = read_csv_bytes(raw)
+        columns, raw_rows = list(raw_df.columns), len(raw_df)
+        df, warnings = self.clean(raw_df)
+        part = self.write_part(df)
+        replaced = meta["parts"] if meta is not None else []
+        self.write_meta(dict(
+            self.snapshot_meta(raw, columns, raw_rows, df),
+            schema=self.SCHEMA,
+            source=self.source,
+            fingerprint=fingerprint,
+            content_hash=content_hash,
+            rows=len(df),
+            parts=[part],
+            warnings=warnings,
+        ))
+        self.remove_parts(replaced)
+        return self.set_frame(df, warnings)
+
+    def stamp(self):
+        """The source fingerprint and row count the frame in memory was built from, or None if unknown.
+
+        Stays the same across processes while the snapshot is unchanged, so
+        stores derived from the frame (the SQL backends' tables) can be reused.
+        """
+        meta = self.meta
+        if self.frame is None or meta is None or meta.get("rows") != len(self.frame):
+            return None
+        marker = meta.get("fingerprint") or meta.get("content_hash")
+        return f"{marker}:{len(self.frame)}" if marker else None
+
+    def snapshot_meta(self, raw, columns, raw_rows, df):
+        """Extra bookkeeping stored alongside a fresh snapshot."""
+        return {}
+
+    def load(self):
+        """Return (frame, warnings), rebuilding the snapshot only if the source changed.
+
+        Repeated calls on the same object reuse the frame already held in memory
+        while the source fingerprint is unchanged. After each call ``appended``
+        holds the rows added by an incremental sync (empty when nothing changed),
+        or None if the frame was loaded or rebuilt in full.
+        """
+        with self.lock:
+            previous = self.frame
+            result = self.load_locked()
+            if self.frame is not previous:
+                self.version += 1
+            return result
+
+    def load_locked(self):
+        os.makedirs(self.path, exist_ok=True)
+        self.appended = None
+        self.appended_at_end = True
+        if self.meta is None:
+            self.meta = self.read_meta()
+            if self.meta is not None and self.meta.get("schema") != self.SCHEMA:
+                self.meta = None
+        meta = self.meta
+        fingerprint = self.fingerprint()
+        if meta is not None and ((fingerprint is None and is_url(self.source)) or fingerprint == meta.get("fingerprint")):
+            if self.frame is not None:
+                self.appended = self.frame.iloc[:0]
+                return self.frame, self.warnings
+            loaded = self.load_snapshot(meta)
+            if loaded is not None:
+                return loaded
+        return self.sync(fingerprint)
+
+    def fingerprint(self):
+        return source_fingerprint(self.source)
+
+    def sync(self, fingerprint):
+        return self.rebuild(fingerprint)
+
+
+class OrderSnapshot(Snapshot):
+    """Order snapshot that ingests only the rows appended to the source since the last load.
+
+    au_report.csv only ever grows, so the snapshot remembers the byte offset it
+    has parsed up to together with a checksum of the bytes just before it.
+    When the source changes and those bytes still match, only the new tail is
+    fetched, cleaned and stored as an extra Parquet part; otherwise the whole
+    file is rebuilt.
+    """
+
+    SCHEMA = 3
+    ANCHOR_BYTES = 4096
+    MAX_PARTS = 32
+
+    def __init__(self, source, cache_dir):
+        super().__init__(source, cache_dir, "orders", clean_orders)
+
+    def combine(self, frames):
+        df = concat_orders(frames) if len(frames) > 1 else frames[0]
+        if not df['OrderDate'].is_monotonic_increasing:
+            df = df.sort_values('OrderDate', kind='stable', ignore_index=True)
+        return df
+
+    def snapshot_meta(self, raw, columns, raw_rows, df):
+        return {
+            "offset": len(raw),
+            "anchor": self.anchor_hash(raw, len(raw)),
+            "columns": columns,
+            "dropped": raw_rows - len(df),
+            "au_prefix": bool(df['OrderID'].str.startswith('AU').any()),
+        }
+
+    def anchor_hash(self, data, end, data_start=0):
+        """Checksum of the ANCHOR_BYTES bytes before ``end`` (an offset into the source)."""
+        start = max(0, end - self.ANCHOR_BYTES)
+        return hashlib.sha256(data[start - data_start:end - data_start]).hexdigest()
+
+    def sync(self, fingerprint):
+        meta = self.meta
+        if meta is None or "offset" not in meta:
+            return self.rebuild(fingerprint)
+        if self.frame is None and self.load_snapshot(meta) is None:
+            return self.rebuild(fingerprint)
+        offset = meta["offset"]
+        anchor_start = max(0, offset - self.ANCHOR_BYTES)
+        data, data_start = read_source_bytes(self.source, anchor_start)
+        if len(data) < offset - data_start or self.anchor_hash(data, offset, data_start) != meta["anchor"]:
+            return self.rebuild(fingerprint)
+        tail = data[offset - data_start:]
+        tail = tail[:tail.rfind(b"\n") + 1]
+        if not tail:
+            self.write_meta(dict(meta, fingerprint=fingerprint))
+            self.appended = self.frame.iloc[:0]
+            return self.frame, self.warnings
+        return self.append(tail, self.anchor_hash(data, offset + len(tail), data_start), fingerprint)
+
+    def append(self, tail, anchor, fingerprint):
+        meta = self.meta
+        rows = pd.read_csv(BytesIO(tail), header=None, names=meta["columns"])
+        rows, dropped = clean_order_rows(rows)
+        parts = list(meta["parts"])
+        self.appended_at_end = rows.empty or self.frame['OrderDate'].iloc[-1] <= rows['OrderDate'].iloc[0]
+        df = self.combine([self.frame, rows]) if not rows.empty else self.frame
+        replaced = []
+        if len(parts) >= self.MAX_PARTS:
+            # Compacted into a new part; the old ones go only after the meta stops listing them
+            replaced, parts = parts, [self.write_part(df)]
+        elif not rows.empty:
+            parts.append(self.write_part(rows))
+        dropped += meta["dropped"]
+        au_prefix = meta["au_prefix"] or bool(rows['OrderID'].str.startswith('AU').any())
+        warnings = order_warnings(dropped, au_prefix)
+        self.write_meta(dict(
+            meta,
+            fingerprint=fingerprint,
+            content_hash=None,
+            offset=meta["offset"] + len(tail),
+            anchor=anchor,
+            rows=len(df),
+            parts=parts,
+            dropped=dropped,
+            au_prefix=au_prefix,
+            warnings=warnings,
+        ))
+        self.remove_parts(replaced)
+        self.appended = rows
+        return self.set_frame(df, warnings)
+
+
+class ShardedOrderSnapshot(OrderSnapshot):
+    """Order snapshot over a directory or glob of CSV/Parquet shards (e.g. daily or monthly extracts).
+
+    Each shard is cleaned on its own and cached as its own Parquet part,
+    keyed by the shard's path and fingerprint, so a new or changed extract
+    costs parsing just that file. Shards that need parsing are cleaned in
+    parallel in a process pool. When the only change is new shards whose
+    rows all follow the existing ones, they are reported as appended rows.
+    """
+
+    def __init__(self, source, cache_dir, workers=None):
+        super().__init__(source, cache_dir)
+        self.workers = workers
+
+    def shard_fingerprints(self):
+        return {path: source_fingerprint(path) for path in shard_paths(self.source)}
+
+    def fingerprint(self):
+        shards = self.shard_fingerprints()
+        if not shards:
+            return None
+        return "shards:" + hashlib.sha256(json.dumps(shards, sort_keys=True).encode()).hexdigest()
+
+    def shard_part(self, path):
+        return f"shard-{hashlib.sha256(os.path.abspath(path).encode()).hexdigest()[:16]}.parquet"
+
+    def clean_shards(self, paths):
+        """Clean shards in parallel; returns {path: (frame, dropped)}."""
+        workers = min(len(paths), self.workers or os.cpu_count() or 1)
+        if workers > 1:
+            # Spawned rather than forked: the app process runs many threads
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                return dict(zip(paths, pool.map(clean_shard, paths)))
+        return {path: clean_shard(path) for path in paths}
+
+    def sync(self, fingerprint):
+        fingerprints = self.shard_fingerprints()
+        if not fingerprints:
+            raise DataError(f"No CSV or Parquet order files found in {self.source}")
+        paths = list(fingerprints)
+        meta = self.meta if self.meta is not None and "shards" in self.meta else None
+        if meta is not None and self.frame is None and self.load_snapshot(meta) is None:
+            meta = None
+        known = meta["shards"] if meta is not None else {}
+        stale = [path for path in paths if known.get(path, {}).get("fingerprint") != fingerprints[path]]
+        cleaned = self.clean_shards(stale)
+
+        shards = {path: known[path] for path in paths if path not in cleaned}
+        for path, (df, dropped) in cleaned.items():
+            shards[path] = {
+                "fingerprint": fingerprints[path],
+                "part": self.write_part_as(df, self.shard_part(path)),
+                "rows": len(df),
+                "dropped": dropped,
+                "au_prefix": bool(df['OrderID'].str.startswith('AU').any()),
+            }
+
+        only_added = meta is not None and set(known) <= set(paths) and not set(stale) & set(known)
+        if only_added:
+            rows = self.combine([cleaned[path][0] for path in stale]) if stale else self.frame.iloc[:0]
+            self.appended_at_end = rows.empty or self.frame['OrderDate'].iloc[-1] <= rows['OrderDate'].iloc[0]
+            df = self.combine([self.frame, rows]) if not rows.empty else self.frame
+            parts = meta["parts"] + [shards[path]["part"] for path in stale]
+            self.appended = rows
+        else:
+            frames = [
+                cleaned[path][0] if path in cleaned else pd.read_parquet(os.path.join(self.path, shards[path]["part"]))
+                for path in paths
+            ]
+            df = self.combine(frames)
+            parts = [shards[path]["part"] for path in paths]
+        if df.empty:
+            raise DataError("No valid OrderDate values after cleaning.")
+        warnings = order_warnings(
+            sum(shard["dropped"] for shard in shards.values()),
+            any(shard["au_prefix"] for shard in shards.values())
+        )
+        self.write_meta(dict(
+            schema=self.SCHEMA,
+            source=self.source,
+            fingerprint=fingerprint,
+            shards=shards,
+            rows=len(df),
+            parts=parts,
+            warnings=warnings,
+        ))
+        self.remove_parts(known[path]["part"] for path in set(known) - set(shards))
+        return self.set_frame(df, warnings)
+
+
+def order_snapshot(source, cache_dir, workers=None):
+    """Snapshot for a single order file or URL, or for a directory/glob of shards."""
+    if is_sharded(source):
+        return ShardedOrderSnapshot(source, cache_dir, workers)
+    return OrderSnapshot(source, cache_dir)
+
+
+def postcode_snapshot(source, cache_dir):
+    return Snapshot(source, cache_dir, "postcodes", clean_postcodes)
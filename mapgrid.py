@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+
+from postcodes import POSTCODE_SLOTS
+
+# Map levels of detail, finest first: label and grid cell size in degrees
+# (None keeps one point per postcode)
+MAP_LEVELS = [
+    ("Postcode", None),
+    ("~10 km grid", 0.1),
+    ("~25 km grid", 0.25),
+    ("~50 km grid", 0.5),
+    ("~100 km grid", 1.0),
+    ("~200 km grid", 2.0),
+]
+MAP_LEVEL_NAMES = [name for name, _ in MAP_LEVELS]
+
+
+class MapGrid:
+    """Bins per-postcode order counts into lat/lon grid cells at several levels of detail.
+
+    The cell of every postcode slot is precomputed for each level from the
+    postcode centroids, so binning a filtered view is a gather plus a few
+    ``bincount`` calls, and the map only ever receives one point per
+    non-empty cell.
+    """
+
+    def __init__(self, postcodes):
+        self.postcodes = postcodes
+        self.latitude = postcodes.values['latitude']
+        self.longitude = postcodes.values['longitude']
+        self.located = ~(np.isnan(self.latitude) | np.isnan(self.longitude))
+        self.cells = {}
+        for name, size in MAP_LEVELS:
+            if size is None:
+                cells = np.arange(POSTCODE_SLOTS, dtype=np.int64)
+            else:
+                columns = int(np.ceil(360 / size)) + 1
+                rows = np.floor((np.nan_to_num(self.latitude) + 90) / size).astype(np.int64)
+                cols = np.floor((np.nan_to_num(self.longitude) + 180) / size).astype(np.int64)
+                cells = rows * columns + cols
+            self.cells[name] = np.where(self.located, cells, -1)
+
+    def has_coords(self, keys):
+        keys = np.asarray(keys)
+        return (keys >= 0) & self.located[keys]
+
+    def bin_count(self, postcode_counts, level):
+        keys = postcode_counts['PostcodeKey'].to_numpy()
+        return len(np.unique(self.cells[level][keys[self.has_coords(keys)]]))
+
+    def auto_level(self, postcode_counts, budget):
+        """Finest level whose number of non-empty cells fits within ``budget`` points."""
+        for name in MAP_LEVEL_NAMES:
+            if self.bin_count(postcode_counts, name) <= budget:
+                return name
+        return MAP_LEVEL_NAMES[-1]
+
+    def bins(self, postcode_counts, level):
+        """One row per non-empty cell with its order-weighted centroid and total orders.
+
+        PostalCode, place_name and state_name describe the cell's busiest
+        postcode; Postcodes is the number of postcodes merged into the cell.
+        """
+        keys = postcode_counts['PostcodeKey'].to_numpy()
+        located = self.has_coords(keys)
+        keys = keys[located]
+        counts = postcode_counts['OrderCount'].to_numpy(dtype=float)[located]
+        postal_codes = postcode_counts['PostalCode'].to_numpy()[located]
+        _, inverse = np.unique(self.cells[level][keys], return_inverse=True)
+        orders = np.bincount(inverse, weights=counts)
+        busiest = np.lexsort((-counts, inverse))
+        first = np.ones(len(busiest), dtype=bool)
+        first[1:] = inverse[busiest][1:] != inverse[busiest][:-1]
+        busiest = busiest[first]
+        return pd.DataFrame({
+            'latitude': np.bincount(inverse, weights=counts * self.latitude[keys]) / orders,
+            'longitude': np.bincount(inverse, weights=counts * self.longitude[keys]) / orders,
+            'OrderCount': orders.astype(np.int64),
+            'Postcodes': np.bincount(inverse),
+            'PostalCode': postal_codes[busiest],
+            'place_name': self.postcodes.lookup(keys[busiest], 'place_name'),
+            'state_name': self.postcodes.lookup(keys[busiest], 'state_name'),
+        })
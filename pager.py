@@ -0,0 +1,144 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Columns the order table can be sorted by
+SORT_COLUMNS = ['OrderDate', 'OrderID', 'PostalCode', 'State']
+
+
+def sort_keys(df, column):
+    """Sortable keys for a column: int32 day numbers for OrderDate, fixed-width UTF-8 bytes for text.
+
+    Bytes sort like the strings they encode but take a few bytes per row
+    instead of a Python object each; categoricals encode only their labels.
+    """
+    values = df[column]
+    if column == 'OrderDate':
+        # Whole days: rows are stored in OrderDate order, so the stable sort keeps times within a day in order
+        return values.to_numpy(dtype='datetime64[ns]').astype('datetime64[D]').astype(np.int32)
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return encode_text(values.cat.categories)[values.cat.codes.to_numpy()]
+    return encode_text(values)
+
+
+def encode_text(values):
+    return np.array(pd.Series(values).astype(str).str.encode('utf-8').tolist(), dtype='S')
+
+
+def position_dtype(rows):
+    """Smallest integer type holding every row position of a frame with ``rows`` rows."""
+    return np.int32 if rows < 2 ** 31 else np.int64
+
+
+class Ordering:
+    """Filtered row positions in display order, with their sort ranks for keyset lookups."""
+
+    def __init__(self, rows, ranks):
+        self.rows = rows
+        self.ranks = ranks
+
+    def __len__(self):
+        return len(self.rows)
+
+    def window(self, start, size):
+        return self.rows[start:start + size]
+
+    def after(self, rank):
+        """Index of the first row that sorts after ``rank``, whether or not that row is in the view."""
+        return int(self.ranks.searchsorted(rank, side='right'))
+
+
+class OrderPager:
+    """Sorted, windowed access to the order rows behind the table.
+
+    Every sortable column keeps a stable permutation of all row positions in
+    column order and its inverse (each row's rank), so ordering a filtered view
+    keeps the permuted positions present in the filter instead of sorting
+    values. The last few orderings are cached; a page is then a slice of one,
+    and "after OrderID X" is a binary search on the ranks, so any page costs
+    the same however deep into the result it is.
+    """
+
+    def __init__(self, df=None, maxsize=16):
+        self.orders = {}
+        self.keys = {}
+        self.ranks = {}
+        self.maxsize = maxsize
+        self.orderings = OrderedDict()
+        self.lock = threading.Lock()
+        if df is not None:
+            self.rebuild(df)
+
+    def __len__(self):
+        return len(self.orders.get('OrderDate', ()))
+
+    def rebuild(self, df):
+        for column in SORT_COLUMNS:
+            keys = sort_keys(df, column)
+            order = np.argsort(keys, kind='stable')
+            self.set_order(column, order, keys[order])
+
+    def copy(self):
+        """A pager sharing this one's permutations that ``append`` can extend without changing this one."""
+        pager = OrderPager(maxsize=self.maxsize)
+        pager.orders = dict(self.orders)
+        pager.keys = dict(self.keys)
+        pager.ranks = dict(self.ranks)
+        return pager
+
+    def append(self, rows):
+        """Merge appended rows into each permutation without re-sorting the existing rows."""
+        offset = len(self)
+        for column in SORT_COLUMNS:
+            keys = sort_keys(rows, column)
+            new_order = np.argsort(keys, kind='stable')
+            existing = self.keys[column]
+            if existing.dtype.kind == 'S' and keys.dtype.itemsize > existing.dtype.itemsize:
+                existing = existing.astype(keys.dtype)
+            insert_at = existing.searchsorted(keys[new_order], side='right')
+            self.set_order(
+                column,
+                np.insert(self.orders[column].astype(position_dtype(offset + len(rows))), insert_at, new_order + offset),
+                np.insert(existing, insert_at, keys[new_order])
+            )
+
+    def set_order(self, column, order, keys):
+        dtype = position_dtype(len(order))
+        self.orders[column] = order.astype(dtype, copy=False)
+        self.keys[column] = keys
+        self.ranks[column] = np.empty(len(order), dtype=dtype)
+        self.ranks[column][order] = np.arange(len(order), dtype=dtype)
+        with self.lock:
+            self.orderings.clear()
+
+    def ordering(self, key, positions, column='OrderDate', ascending=True):
+        """Ordering of the rows at ``positions`` by ``column``, cached under ``key``."""
+        key = (key, column, ascending)
+        with self.lock:
+            ordering = self.orderings.get(key)
+            if ordering is not None:
+                self.orderings.move_to_end(key)
+                return ordering
+        order = self.orders[column]
+        if isinstance(positions, slice) and (positions.start, positions.stop) == (0, len(order)):
+            rows = order
+        else:
+            selected = np.zeros(len(order), dtype=bool)
+            selected[positions] = True
+            rows = order[selected[order]]
+        ranks = self.ranks[column][rows]
+        if not ascending:
+            rows, ranks = rows[::-1], -ranks[::-1]
+        ordering = Ordering(rows, ranks)
+        with self.lock:
+            self.orderings[key] = ordering
+            while len(self.orderings) > self.maxsize:
+                self.orderings.popitem(last=False)
+        return ordering
+
+    def rank(self, row, column='OrderDate', ascending=True):
+        """Sort rank of a row, in the direction used by ``ordering``."""
+        rank = self.ranks[column][row]
+        return rank if ascending else -rank
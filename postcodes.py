@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+
+# Australian postcodes are four digits, so every postcode has a slot in 0-9999
+POSTCODE_SLOTS = 10000
+LABEL_COLUMNS = ['place_name', 'state_code', 'state_name']
+VALUE_COLUMNS = ['latitude', 'longitude']
+
+
+def postcode_keys(postcodes):
+    """Integer postcode keys as int16, with -1 for anything that is not a 0-9999 number."""
+    keys = pd.to_numeric(pd.Series(postcodes).astype(str).str.strip(), errors='coerce')
+    keys = keys.where((keys >= 0) & (keys < POSTCODE_SLOTS) & (keys % 1 == 0))
+    return keys.fillna(-1).astype(np.int16)
+
+
+class PostcodeDimension:
+    """Postcode reference data as arrays indexed by integer postcode.
+
+    Text attributes are stored as int32 codes into sorted label arrays and
+    coordinates as float arrays, so enriching order counts with suburb, state
+    and lat/lon is an array gather by PostcodeKey instead of a string merge.
+    """
+
+    def __init__(self, postcode_df):
+        keys = postcode_keys(postcode_df['postcode']).to_numpy()
+        valid = keys >= 0
+        keys = keys[valid]
+        self.known = np.zeros(POSTCODE_SLOTS, dtype=bool)
+        self.known[keys] = True
+        self.codes = {}
+        self.labels = {}
+        for col in LABEL_COLUMNS:
+            codes, labels = pd.factorize(postcode_df[col][valid], sort=True)
+            self.codes[col] = np.full(POSTCODE_SLOTS, -1, dtype=np.int32)
+            self.codes[col][keys] = codes
+            self.labels[col] = labels
+        self.values = {}
+        for col in VALUE_COLUMNS:
+            self.values[col] = np.full(POSTCODE_SLOTS, np.nan)
+            if col in postcode_df.columns:
+                self.values[col][keys] = postcode_df[col][valid].to_numpy(dtype=float)
+
+    def lookup_codes(self, keys, col):
+        keys = np.asarray(keys)
+        return np.where(keys >= 0, self.codes[col][keys], -1)
+
+    def lookup(self, keys, col):
+        """Attribute values for an array of PostcodeKeys; unknown postcodes give NaN."""
+        if col in self.values:
+            keys = np.asarray(keys)
+            return np.where(keys >= 0, self.values[col][keys], np.nan)
+        return pd.Categorical.from_codes(self.lookup_codes(keys, col), self.labels[col])
+
+    def label(self, key):
+        """"2000 Sydney (NSW)" for a PostcodeKey, or just the number if it is not in the reference data."""
+        place = self.codes['place_name'][key] if key >= 0 else -1
+        if place < 0:
+            return str(key)
+        return f"{key} {self.labels['place_name'][place]} ({self.labels['state_code'][self.codes['state_code'][key]]})"
+
+    def located_keys(self):
+        """PostcodeKeys that have coordinates."""
+        return np.flatnonzero(~np.isnan(self.values['latitude']) & ~np.isnan(self.values['longitude']))
+
+    def suburb_counts(self, postcode_counts):
+        """Sum per-postcode OrderCount by (place_name, state_code); unknown postcodes are left out."""
+        keys = postcode_counts['PostcodeKey'].to_numpy()
+        place = self.lookup_codes(keys, 'place_name')
+        state = self.lookup_codes(keys, 'state_code')
+        mapped = place >= 0
+        totals = pd.DataFrame({
+            'place': place[mapped],
+            'state': state[mapped],
+            'OrderCount': postcode_counts['OrderCount'].to_numpy()[mapped]
+        }).groupby(['place', 'state'])['OrderCount'].sum()
+        return pd.DataFrame({
+            'place_name': self.labels['place_name'][totals.index.get_level_values('place')],
+            'state_code': self.labels['state_code'][totals.index.get_level_values('state')],
+            'OrderCount': totals.to_numpy()
+        })
+
+
+def representative_mask(df):
+    """Mark one representative locality per postcode in a single sort.
+
+    Within each PostcodeKey, rows with coordinates win, then the highest
+    accuracy, then the locality closest to the postcode's centroid, then file
+    order; rows are never mixed, so every column of the pick comes from the
+    same locality.
+    Rows without a valid key are never representatives.
+    """
+    keys = df['PostcodeKey'].to_numpy()
+    if set(VALUE_COLUMNS) <= set(df.columns):
+        lat = df['latitude'].to_numpy(dtype=float)
+        lon = df['longitude'].to_numpy(dtype=float)
+        has_coords = ~(np.isnan(lat) | np.isnan(lon))
+        centroid_lat = df['latitude'].groupby(keys).transform('mean').to_numpy(dtype=float)
+        centroid_lon = df['longitude'].groupby(keys).transform('mean').to_numpy(dtype=float)
+        distance = np.nan_to_num((lat - centroid_lat) ** 2 + (lon - centroid_lon) ** 2, nan=np.inf)
+        # Rounded so equidistant localities tie and keep their file order
+        distance = np.round(distance, 8)
+    else:
+        has_coords = np.zeros(len(df), dtype=bool)
+        distance = np.zeros(len(df))
+    if 'accuracy' in df.columns:
+        accuracy = df['accuracy'].to_numpy(dtype=float)
+        accuracy = np.where(np.isnan(accuracy), -np.inf, accuracy)
+    else:
+        accuracy = np.zeros(len(df))
+    order = np.lexsort((distance, -accuracy, ~has_coords, keys))
+    sorted_keys = keys[order]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = sorted_keys[1:] != sorted_keys[:-1]
+    mask = np.zeros(len(df), dtype=bool)
+    mask[order[first & (sorted_keys >= 0)]] = True
+    return mask
@@ -0,0 +1,199 @@
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+
+def resident_bytes():
+    """Current resident set size, or None where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def mib(value):
+    return None if value is None else round(value / 2 ** 20, 2)
+
+
+def object_bytes(obj, seen=None):
+    """Approximate bytes held by ``obj`` and everything it references.
+
+    NumPy buffers and pandas data (deep, so Python strings are counted) are
+    measured directly; containers and objects are walked through their items
+    and attributes. Anything reachable twice is counted once.
+    """
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, np.ndarray):
+        size = obj.nbytes
+        if obj.dtype == object:
+            size += sum(sys.getsizeof(value) for value in obj.ravel())
+        return size
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=True, deep=True).sum())
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return int(obj.memory_usage(deep=True))
+    if isinstance(obj, pd.Categorical):
+        return int(obj.memory_usage(deep=True))
+    if isinstance(obj, (str, bytes, int, float, bool, type(None))):
+        return sys.getsizeof(obj)
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        return size + sum(object_bytes(k, seen) + object_bytes(v, seen) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return size + sum(object_bytes(value, seen) for value in obj)
+    attributes = getattr(obj, '__dict__', None)
+    if attributes is not None:
+        size += object_bytes(attributes, seen)
+    for name in getattr(type(obj), '__slots__', ()):
+        size += object_bytes(getattr(obj, name, None), seen)
+    return size
+
+
+def memory_report(components, rows=None):
+    """MiB held by each named component, largest first, with a Total row.
+
+    With ``rows`` (the number of orders) a bytes-per-order column is added.
+    """
+    sizes = pd.Series({name: object_bytes(obj) for name, obj in components.items()}, dtype=float)
+    sizes = sizes.sort_values(ascending=False)
+    sizes['Total'] = sizes.sum()
+    report = pd.DataFrame({'component': sizes.index, 'MiB': (sizes / 2 ** 20).round(2).to_numpy()})
+    if rows:
+        report['bytes per order'] = (sizes / rows).round(1).to_numpy()
+    return report
+
+
+class PeakMemory:
+    """Samples the resident set size in a background thread while the block runs."""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.start = self.peak = None
+        self.done = threading.Event()
+
+    def sample(self):
+        while not self.done.wait(self.interval):
+            self.peak = max(self.peak, resident_bytes())
+
+    def __enter__(self):
+        self.start = self.peak = resident_bytes()
+        if self.start is not None:
+            self.thread = threading.Thread(target=self.sample, daemon=True)
+            self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.done.set()
+        if self.start is not None:
+            self.thread.join()
+            self.peak = max(self.peak, resident_bytes())
+
+    def growth(self):
+        """Peak bytes above the starting resident size (NaN if it could not be sampled)."""
+        return float("nan") if self.start is None else self.peak - self.start
+
+
+class RerunProfile:
+    """Wall time, rows in/out and resident-memory change per section of one rerun.
+
+    ``start(name)`` closes the running section and opens the next, so the
+    script is instrumented with one call at the top of each section rather
+    than by re-indenting it. A disabled profile ignores every call.
+    """
+
+    def __init__(self, enabled=True, metrics_path=None, **context):
+        self.enabled = enabled or bool(metrics_path)
+        self.metrics_path = metrics_path
+        self.context = context
+        self.records = []
+        self.current = None
+        # Set once the rerun's sections are written; a fragment rerunning on its own comes after that
+        self.written = False
+
+    def start(self, name, rows_in=None):
+        if not self.enabled:
+            return
+        self.finish()
+        self.current = {
+            'stage': name,
+            'rows_in': rows_in,
+            'rows_out': None,
+            'started': time.perf_counter(),
+            'memory_start': resident_bytes(),
+        }
+
+    def rows(self, rows_out):
+        """Record how many rows the running section produced."""
+        if self.current is not None:
+            self.current['rows_out'] = rows_out
+
+    def finish(self):
+        """Close the running section, if any."""
+        if self.current is None:
+            return
+        record = self.current
+        self.current = None
+        memory_end = resident_bytes()
+        self.records.append({
+            'stage': record['stage'],
+            'seconds': round(time.perf_counter() - record['started'], 4),
+            'rows_in': record['rows_in'],
+            'rows_out': record['rows_out'],
+            'memory_mib': mib(memory_end),
+            'memory_delta_mib': mib(
+                None if memory_end is None or record['memory_start'] is None else memory_end - record['memory_start']
+            ),
+        })
+
+    def measure(self, name, build, rows_in=None):
+        """Run ``build()`` as a section of its own, writing it straight to the metrics file.
+
+        For work that runs outside the rerun, such as a download built on click.
+        """
+        if not self.enabled:
+            return build()
+        profile = RerunProfile(True, self.metrics_path, **self.context)
+        profile.start(name, rows_in)
+        result = build()
+        profile.finish()
+        profile.write_metrics()
+        return result
+
+    def section(self, name, build, rows_in=None):
+        """Run ``build()`` as the next section of the rerun, or on its own once the rerun is written.
+
+        For the body of a fragment, which also reruns without the rest of the script.
+        """
+        if self.written:
+            return self.measure(name, build, rows_in)
+        self.start(name, rows_in)
+        return build()
+
+    def frame(self):
+        self.finish()
+        frame = pd.DataFrame(self.records, columns=[
+            'stage', 'seconds', 'rows_in', 'rows_out', 'memory_mib', 'memory_delta_mib'
+        ])
+        total = pd.DataFrame([{'stage': 'Total', 'seconds': frame['seconds'].sum()}])
+        return pd.concat([frame, total], ignore_index=True) if not frame.empty else frame
+
+    def write_metrics(self):
+        """Append the rerun's sections to the JSONL metrics file, one line per section."""
+        self.finish()
+        self.written = True
+        if not self.metrics_path or not self.records:
+            return
+        timestamp = datetime.now(timezone.utc).isoformat()
+        lines = [json.dumps(dict(self.context, time=timestamp, **record), default=str) for record in self.records]
+        with open(self.metrics_path, "a") as f:
+            f.write("\n".join(lines) + "\n")
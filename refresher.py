@@ -0,0 +1,64 @@
+import threading
+import time
+
+
+class Refresher:
+    """Keeps a data state current from a daemon thread, off the request path.
+
+    ``build(previous)`` checks the sources and returns either ``previous``
+    (nothing changed) or a complete new state with every derived structure
+    already built. The result replaces ``state`` in a single assignment, so a
+    rerun that reads ``current()`` gets the old version or the new one, never
+    a mix, and never waits for ingestion once the first state exists. Calls
+    to ``refresh`` are serialised; a failed background refresh keeps serving
+    the previous state and records the error in ``error``.
+    """
+
+    def __init__(self, build, interval=0):
+        self.build = build
+        self.interval = interval
+        self.state = None
+        self.checked_at = None
+        self.error = None
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def refresh(self):
+        """Check the sources now and swap in the new state; returns the current state."""
+        with self.lock:
+            try:
+                state = self.build(self.state)
+            except Exception as e:
+                self.error = e
+                raise
+            self.state = state
+            self.checked_at = time.time()
+            self.error = None
+            return state
+
+    def current(self):
+        """The latest complete state, building the first one if there is none yet."""
+        state = self.state
+        return state if state is not None else self.refresh()
+
+    def start(self):
+        """Refresh every ``interval`` seconds in a daemon thread (not at all if it is 0)."""
+        if self.interval > 0 and self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="data-refresher", daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception:
+                # Recorded in self.error; the previous state stays in service
+                pass
@@ -0,0 +1,170 @@
+import numpy as np
+
+from pager import position_dtype
+
+MATCH_MODES = ["Contains", "Starts with", "Exact"]
+
+
+def encode_ids(order_ids):
+    """Lower-cased OrderIDs as a fixed-width bytes array, for case-insensitive matching."""
+    return np.array(order_ids.str.lower().str.encode('utf-8').tolist(), dtype='S')
+
+
+class OrderIdIndex:
+    """Search structure over OrderIDs returning matching row positions.
+
+    Exact and prefix matches are binary searches over a sorted copy of the
+    IDs. Literal substring matches use trigram postings (sorted row positions
+    per 3-byte sequence); candidates from the rarest trigrams are then
+    checked against the query. One- and two-character queries take every
+    trigram starting with them (a contiguous run of postings) plus the rows
+    whose last two characters match, from a sorted array of those endings.
+    All of it is built with the index and extended by ``append``, so no query
+    scans the IDs.
+    """
+
+    def __init__(self, df=None):
+        self.ids = np.array([], dtype='S1')
+        self.order = np.array([], dtype=np.intp)
+        self.sorted_ids = self.ids
+        self.codes = np.array([], dtype=np.int32)
+        self.starts = np.array([0], dtype=np.intp)
+        self.postings = np.array([], dtype=np.int32)
+        self.ends = np.array([], dtype=np.uint16)
+        self.end_order = np.array([], dtype=np.int32)
+        if df is not None:
+            self.rebuild(df)
+
+    def rebuild(self, df):
+        self.ids = encode_ids(df['OrderID'])
+        self.order = np.argsort(self.ids, kind='stable').astype(position_dtype(len(self.ids)))
+        self.sorted_ids = self.ids[self.order]
+        self.codes, counts, self.postings = self.trigram_postings(self.ids, 0)
+        self.starts = np.concatenate([[0], np.cumsum(counts)])
+        ends = self.end_codes(self.ids)
+        self.end_order = np.argsort(ends, kind='stable').astype(position_dtype(len(ends)))
+        self.ends = ends[self.end_order]
+
+    def copy(self):
+        """An index sharing this one's arrays that ``append`` can extend without changing this one."""
+        index = OrderIdIndex()
+        # append assigns new arrays rather than writing into the shared ones
+        vars(index).update(vars(self))
+        return index
+
+    def append(self, rows):
+        """Merge appended rows into the sorted IDs and postings without re-sorting the existing ones."""
+        offset = len(self.ids)
+        new_ids = encode_ids(rows['OrderID'])
+        new_order = np.argsort(new_ids, kind='stable')
+        insert_at = self.sorted_ids.searchsorted(new_ids[new_order], side='right')
+        width = max(self.ids.dtype.itemsize, new_ids.dtype.itemsize)
+        dtype = position_dtype(offset + len(new_ids))
+        self.sorted_ids = np.insert(self.sorted_ids.astype(f'S{width}'), insert_at, new_ids[new_order])
+        self.order = np.insert(self.order.astype(dtype), insert_at, new_order + offset)
+        self.ids = np.concatenate([self.ids.astype(f'S{width}'), new_ids])
+        # New rows come after every existing posting, so each goes at the end of its trigram's run
+        codes, counts, postings = self.trigram_postings(new_ids, offset)
+        ends = self.codes.searchsorted(codes, side='right')
+        self.postings = np.insert(self.postings.astype(dtype), np.repeat(self.starts[ends], counts), postings)
+        merged = np.union1d(self.codes, codes)
+        totals = np.zeros(len(merged), dtype=np.intp)
+        totals[merged.searchsorted(self.codes)] += np.diff(self.starts)
+        totals[merged.searchsorted(codes)] += counts
+        self.codes = merged
+        self.starts = np.concatenate([[0], np.cumsum(totals)])
+        new_ends = self.end_codes(new_ids)
+        end_order = np.argsort(new_ends, kind='stable')
+        insert_at = self.ends.searchsorted(new_ends[end_order], side='right')
+        self.ends = np.insert(self.ends, insert_at, new_ends[end_order])
+        self.end_order = np.insert(self.end_order.astype(dtype), insert_at, end_order + offset)
+
+    def search(self, query, mode="Contains"):
+        """Sorted row positions whose OrderID matches ``query`` (case-insensitive)."""
+        key = query.lower().encode('utf-8')
+        if mode == "Exact":
+            lo = self.sorted_ids.searchsorted(key)
+            hi = self.sorted_ids.searchsorted(key, side='right')
+        elif mode == "Starts with":
+            lo = self.sorted_ids.searchsorted(key)
+            hi = self.sorted_ids.searchsorted(key + b'\xff')
+        else:
+            return self.contains(key)
+        return np.sort(self.order[lo:hi]).astype(np.intp)
+
+    def contains(self, key):
+        if len(key) < 3:
+            return self.contains_short(key)
+        query_codes = np.unique(self.trigram_codes(np.frombuffer(key, dtype=np.uint8)[None, :])[0])
+        slots = self.codes.searchsorted(query_codes)
+        found = slots < len(self.codes)
+        if not found.all() or (self.codes[slots] != query_codes).any():
+            return np.array([], dtype=np.intp)
+        # Intersect the two rarest postings, then check the candidates left against the key
+        lists = sorted((self.postings[self.starts[i]:self.starts[i + 1]] for i in slots), key=len)
+        candidates = lists[0][np.r_[True, lists[0][1:] != lists[0][:-1]]] if len(lists[0]) else lists[0]
+        if len(lists) > 1 and len(candidates):
+            # Postings are sorted, so membership is a binary search
+            slots = np.minimum(lists[1].searchsorted(candidates), len(lists[1]) - 1)
+            candidates = candidates[lists[1][slots] == candidates]
+        if len(lists) > 2 or len(key) > 3:
+            candidates = candidates[np.char.find(self.ids[candidates], key) >= 0]
+        return candidates.astype(np.intp)
+
+    def contains_short(self, key):
+        """Rows containing a one- or two-byte ``key``."""
+        chars = list(key)
+        if not chars:
+            return np.arange(len(self.ids), dtype=np.intp)
+        # Trigrams starting with the key form one range of codes, so one run of postings
+        shift = 8 * (3 - len(chars))
+        prefix = int.from_bytes(key, 'big') << shift
+        lo, hi = self.codes.searchsorted([prefix, prefix + (1 << shift)])
+        runs = [self.postings[self.starts[lo]:self.starts[hi]]]
+        # The key may also start in the last two bytes, which no trigram starts at
+        if len(chars) == 2:
+            end = (chars[0] << 8) | chars[1]
+            ranges = [(end, end + 1)]
+        else:
+            # As the second-to-last byte (one range), or as the last byte after any other
+            ranges = [(chars[0] << 8, (chars[0] + 1) << 8)]
+            ranges += [((high << 8) | chars[0], ((high << 8) | chars[0]) + 1) for high in range(256)]
+        bounds = self.ends.searchsorted(np.array(ranges, dtype=np.int64).ravel()).reshape(-1, 2)
+        runs += [self.end_order[lo:hi] for lo, hi in bounds if hi > lo]
+        selected = np.zeros(len(self.ids), dtype=bool)
+        for rows in runs:
+            selected[rows] = True
+        return np.flatnonzero(selected)
+
+    @staticmethod
+    def trigram_codes(chars):
+        """24-bit codes for every 3-byte window of each row; 0 marks windows past the end."""
+        chars = chars.astype(np.int32)
+        codes = (chars[:, :-2] << 16) | (chars[:, 1:-1] << 8) | chars[:, 2:]
+        return np.where(chars[:, 2:] != 0, codes, 0)
+
+    @staticmethod
+    def id_bytes(ids):
+        return np.frombuffer(ids.tobytes(), dtype=np.uint8).reshape(len(ids), ids.dtype.itemsize)
+
+    @classmethod
+    def trigram_postings(cls, ids, offset):
+        """(sorted trigram codes, postings per code, row positions + offset grouped by code)."""
+        width = ids.dtype.itemsize
+        codes = cls.trigram_codes(cls.id_bytes(ids)).ravel()
+        rows = np.repeat(np.arange(offset, offset + len(ids), dtype=position_dtype(offset + len(ids))), max(width - 2, 0))
+        valid = codes != 0
+        codes, rows = codes[valid], rows[valid]
+        order = np.argsort(codes, kind='stable')
+        unique_codes, counts = np.unique(codes[order], return_counts=True)
+        return unique_codes.astype(np.int32), counts, rows[order]
+
+    @classmethod
+    def end_codes(cls, ids):
+        """16-bit code of each ID's last two bytes (just the last byte for one-byte IDs)."""
+        chars = cls.id_bytes(ids).astype(np.uint16)
+        lengths = (chars != 0).sum(axis=1)
+        rows = np.arange(len(ids))
+        last = np.where(lengths > 0, chars[rows, np.maximum(lengths - 1, 0)], 0)
+        before = np.where(lengths > 1, chars[rows, np.maximum(lengths - 2, 0)], 0)
+        return (before << 8) | last
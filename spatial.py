@@ -0,0 +1,232 @@
+import numpy as np
+import pandas as pd
+
+from postcodes import POSTCODE_SLOTS
+
+EARTH_RADIUS_KM = 6371.0
+# Most points in a KD-tree leaf
+LEAF_SIZE = 16
+
+
+def unit_vectors(latitude, longitude):
+    """(n, 3) points on the unit sphere for latitudes and longitudes in degrees."""
+    lat = np.radians(np.asarray(latitude, dtype=float))
+    lon = np.radians(np.asarray(longitude, dtype=float))
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+def chord(km):
+    """Straight-line distance through the unit sphere for a great-circle distance."""
+    return 2 * np.sin(np.minimum(np.asarray(km, dtype=float) / EARTH_RADIUS_KM, np.pi) / 2)
+
+
+def great_circle(chords):
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(chords / 2, 0, 1))
+
+
+class KDTree:
+    """Static KD-tree over lat/lon points, answering great-circle queries.
+
+    Points are stored as 3-D unit vectors, where straight-line (chord)
+    distance grows with great-circle distance, so a radius or nearest query
+    in kilometres is an ordinary Euclidean query. The tree splits on the
+    widest axis at the median down to leaves of ``leaf_size`` points. Queries
+    walk the tree one level at a time for any number of query points at once,
+    keeping only the (query, node) pairs whose bounding box can still hold an
+    answer, and measure the points of the leaves they reach as arrays.
+    """
+
+    def __init__(self, latitude, longitude, leaf_size=LEAF_SIZE):
+        points = unit_vectors(latitude, longitude)
+        order = np.arange(len(points))
+        nodes, leaves = [], []
+        if len(points):
+            self.split(points, order, leaf_size, nodes, leaves)
+        self.ids = np.concatenate(leaves) if leaves else order
+        self.points = points[self.ids]
+        sizes = np.array([len(leaf) for leaf in leaves], dtype=np.intp)
+        starts = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.intp)
+        # Node 0 is the root; children are -1 below a leaf, and leaf is -1 above one
+        self.lo = np.array([node[0] for node in nodes]).reshape(-1, 3)
+        self.hi = np.array([node[1] for node in nodes]).reshape(-1, 3)
+        self.children = np.array([node[2] for node in nodes], dtype=np.intp).reshape(-1, 2)
+        self.leaf = np.array([node[3] for node in nodes], dtype=np.intp)
+        # Leaf members as a padded (leaves, leaf_size) table of point slots; padding is -1
+        self.members = np.full((len(leaves), max(sizes, default=0)), -1, dtype=np.intp)
+        for i, (start, size) in enumerate(zip(starts, sizes)):
+            self.members[i, :size] = np.arange(start, start + size)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def split(cls, points, order, leaf_size, nodes, leaves):
+        """Add the subtree over the points ``order`` to ``nodes`` and ``leaves``; returns its node."""
+        subset = points[order]
+        node = len(nodes)
+        nodes.append([subset.min(axis=0), subset.max(axis=0), [-1, -1], -1])
+        if len(order) <= leaf_size:
+            nodes[node][3] = len(leaves)
+            leaves.append(order)
+            return node
+        axis = int((subset.max(axis=0) - subset.min(axis=0)).argmax())
+        ranked = order[np.argsort(subset[:, axis], kind='stable')]
+        middle = len(ranked) // 2
+        nodes[node][2] = [
+            cls.split(points, ranked[:middle], leaf_size, nodes, leaves),
+            cls.split(points, ranked[middle:], leaf_size, nodes, leaves),
+        ]
+        return node
+
+    def box_distances(self, queries, rows, nodes):
+        """Chord distance from each queries[rows] to the bounding box of the matching node."""
+        point = queries[rows]
+        gap = np.maximum(np.maximum(self.lo[nodes] - point, point - self.hi[nodes]), 0)
+        return np.sqrt((gap ** 2).sum(axis=1))
+
+    def pair_distances(self, queries, rows, leaves):
+        """Chord distances from queries[rows] to every member of leaves, padding as inf."""
+        slots = self.members[leaves]
+        distance = np.sqrt(((self.points[slots] - queries[rows][:, None, :]) ** 2).sum(axis=2))
+        return np.where(slots >= 0, distance, np.inf), slots
+
+    def descend(self, rows, nodes):
+        """Children of the internal nodes among (rows, nodes), and the leaves reached."""
+        reached = self.leaf[nodes] >= 0
+        inner = ~reached
+        return (
+            np.repeat(rows[inner], 2), self.children[nodes[inner]].ravel(),
+            rows[reached], self.leaf[nodes[reached]],
+        )
+
+    def within(self, latitude, longitude, radius_km):
+        """Ids of the points within ``radius_km`` of one location, in id order."""
+        query = unit_vectors([latitude], [longitude])
+        radius = chord(radius_km)
+        nodes = np.zeros(min(len(self), 1), dtype=np.intp)
+        found = []
+        while len(nodes):
+            nodes = nodes[self.box_distances(query, np.zeros(len(nodes), dtype=np.intp), nodes) <= radius]
+            _, nodes, _, leaves = self.descend(np.zeros(len(nodes), dtype=np.intp), nodes)
+            found.append(leaves)
+        leaves = np.concatenate(found) if found else np.array([], dtype=np.intp)
+        if len(leaves) == 0:
+            return np.array([], dtype=np.intp)
+        distance, slots = self.pair_distances(query, np.zeros(len(leaves), dtype=np.intp), leaves)
+        return np.sort(self.ids[slots[distance <= radius]])
+
+    def nearest(self, latitude, longitude):
+        """Id of, and great-circle km to, the nearest point for each query location."""
+        queries = unit_vectors(latitude, longitude)
+        n = len(queries)
+        if n == 0 or len(self) == 0:
+            return np.full(n, -1, dtype=np.intp), np.full(n, np.inf)
+        # A first answer from the leaf each query reaches by always taking the closer child ...
+        rows = np.arange(n)
+        nodes = np.zeros(n, dtype=np.intp)
+        inner = self.leaf[nodes] < 0
+        while inner.any():
+            children = self.children[nodes[inner]]
+            near = [self.box_distances(queries, rows[inner], children[:, side]) for side in (0, 1)]
+            nodes[inner] = np.where(near[1] < near[0], children[:, 1], children[:, 0])
+            inner = self.leaf[nodes] < 0
+        distance, slots = self.pair_distances(queries, rows, self.leaf[nodes])
+        pick = distance.argmin(axis=1)
+        best = distance[rows, pick]
+        best_slot = slots[rows, pick]
+        # ... bounds the search: only nodes whose box is closer than the best so far are opened
+        nodes = np.zeros(n, dtype=np.intp)
+        while len(rows):
+            keep = self.box_distances(queries, rows, nodes) < best[rows]
+            rows, nodes, leaf_rows, leaves = self.descend(rows[keep], nodes[keep])
+            if len(leaf_rows):
+                distance, slots = self.pair_distances(queries, leaf_rows, leaves)
+                pick = distance.argmin(axis=1)
+                candidate = distance[np.arange(len(leaf_rows)), pick]
+                order = np.lexsort((candidate, leaf_rows))
+                first = np.r_[True, leaf_rows[order][1:] != leaf_rows[order][:-1]]
+                winners = order[first]
+                closer = candidate[winners] < best[leaf_rows[winners]]
+                improved = leaf_rows[winners][closer]
+                best[improved] = candidate[winners][closer]
+                best_slot[improved] = slots[winners, pick[winners]][closer]
+        return self.ids[best_slot], great_circle(best)
+
+
+class PostcodeTree:
+    """KD-tree over the centroids of every located postcode, for radius filters."""
+
+    def __init__(self, postcodes):
+        self.latitude = postcodes.values['latitude']
+        self.longitude = postcodes.values['longitude']
+        self.keys = postcodes.located_keys()
+        self.tree = KDTree(self.latitude[self.keys], self.longitude[self.keys])
+
+    def within(self, key, radius_km):
+        """PostcodeKeys within ``radius_km`` (great-circle) of postcode ``key``, in key order."""
+        if np.isnan(self.latitude[key]) or np.isnan(self.longitude[key]):
+            return np.array([], dtype=np.intp)
+        return self.keys[self.tree.within(self.latitude[key], self.longitude[key], radius_km)]
+
+
+class DepotIndex:
+    """Nearest depot and distance to it for every postcode slot.
+
+    Depots are {name: postcode} and sit at their postcode's centroid. A
+    KD-tree over the depots is queried once with every located postcode, so
+    per-order distances are a gather by PostcodeKey over the order table.
+    """
+
+    def __init__(self, postcodes, depots):
+        latitude = postcodes.values['latitude']
+        longitude = postcodes.values['longitude']
+        keys = np.array([int(postcode) for postcode in depots.values()], dtype=np.intp)
+        located = (keys >= 0) & (keys < POSTCODE_SLOTS)
+        located[located] = ~np.isnan(latitude[keys[located]]) & ~np.isnan(longitude[keys[located]])
+        self.names = np.array([name for name, ok in zip(depots, located) if ok], dtype=object)
+        self.keys = keys[located]
+        self.tree = KDTree(latitude[self.keys], longitude[self.keys])
+        self.depot = np.full(POSTCODE_SLOTS, -1, dtype=np.intp)
+        self.distance = np.full(POSTCODE_SLOTS, np.nan)
+        slots = np.flatnonzero(~np.isnan(latitude) & ~np.isnan(longitude))
+        if len(self.keys) and len(slots):
+            self.depot[slots], self.distance[slots] = self.tree.nearest(latitude[slots], longitude[slots])
+
+    def __len__(self):
+        return len(self.keys)
+
+    def nearest(self, keys):
+        """(depot name, km) per PostcodeKey; unknown or unlocated postcodes give None and NaN."""
+        keys = np.asarray(keys)
+        valid = keys >= 0
+        depot = np.where(valid, self.depot[np.where(valid, keys, 0)], -1)
+        distance = np.where(valid, self.distance[np.where(valid, keys, 0)], np.nan)
+        names = np.where(depot >= 0, self.names[np.maximum(depot, 0)] if len(self.names) else None, None)
+        return names, distance
+
+    def summary(self, postcode_counts, radius_km):
+        """Orders served by each nearest depot with order-weighted distance statistics.
+
+        ``postcode_counts`` has PostcodeKey and OrderCount; orders whose
+        postcode has no coordinates are left out.
+        """
+        names, distance = self.nearest(postcode_counts['PostcodeKey'].to_numpy())
+        counts = postcode_counts['OrderCount'].to_numpy()
+        located = ~np.isnan(distance)
+        rows = []
+        for i, name in enumerate(self.names):
+            mine = located & (names == name)
+            if not mine.any():
+                continue
+            order = np.argsort(distance[mine], kind='stable')
+            km = distance[mine][order]
+            cumulative = np.cumsum(counts[mine][order])
+            total = cumulative[-1]
+            rows.append({
+                'Depot': name,
+                'Orders': int(total),
+                'Median km': float(km[cumulative.searchsorted(total * 0.5)]),
+                'P90 km': float(km[cumulative.searchsorted(total * 0.9)]),
+                f'Within {radius_km} km': float(counts[mine][distance[mine] <= radius_km].sum() / total * 100),
+            })
+        return pd.DataFrame(rows, columns=['Depot', 'Orders', 'Median km', 'P90 km', f'Within {radius_km} km'])
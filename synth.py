@@ -0,0 +1,90 @@
+"""Synthetic AU order extracts shaped like au_report.csv, for benchmarks and load testing.
+
+Usage: python synth.py ROWS OUT.csv [--seed N] [--postcodes postcode_data.csv]
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from config import POSTCODES_SOURCE
+
+# Share of orders per state, roughly as in the real report
+STATE_SHARES = {
+    'NSW': 0.36, 'VIC': 0.285, 'WA': 0.13, 'QLD': 0.11, 'SA': 0.08, 'ACT': 0.014, 'TAS': 0.011, 'NT': 0.006,
+}
+# OrderID prefixes and their shares ("" is a bare 14-digit number)
+ORDER_ID_PREFIXES = {'AU': 0.985, 'IE': 0.01, '': 0.005}
+START_DATE = '2020-01-01'
+END_DATE = '2025-04-30'
+CHUNK_ROWS = 1_000_000
+# Coprime with 10**13, so (ID_OFFSET + i * ID_STRIDE) mod 10**13 never repeats
+# within a run; small enough that i * ID_STRIDE fits in int64 up to 100M rows
+ID_STRIDE = 61_803_398_877
+ID_OFFSET = 2_016_479_707_213
+
+
+def postcode_weights(postcode_df):
+    """Postcodes with a sampling weight: the state's order share spread by locality count."""
+    localities = postcode_df.groupby(['postcode', 'state_code']).size().reset_index(name='localities')
+    localities = localities[localities['state_code'].isin(STATE_SHARES)]
+    state_localities = localities.groupby('state_code')['localities'].transform('sum')
+    weights = localities['state_code'].map(STATE_SHARES) * localities['localities'] / state_localities
+    return localities['postcode'].to_numpy(), localities['state_code'].to_numpy(), (weights / weights.sum()).to_numpy()
+
+
+def day_weights(days):
+    """Orders per day grow over the period, with a yearly season and quieter weekends."""
+    t = np.linspace(0, 1, len(days))
+    season = 1 + 0.25 * np.cos(2 * np.pi * (days.dayofyear.to_numpy() - 330) / 365.25)
+    weekday = np.where(days.dayofweek.to_numpy() >= 5, 0.7, 1.0)
+    weights = (1 + 3 * t) * season * weekday
+    return weights / weights.sum()
+
+
+def order_ids(rng, start, rows):
+    numbers = (ID_OFFSET + np.arange(start, start + rows, dtype=np.int64) * ID_STRIDE) % 10 ** 13
+    prefixes = rng.choice(list(ORDER_ID_PREFIXES), size=rows, p=list(ORDER_ID_PREFIXES.values()))
+    digits = pd.Series(numbers).astype(str).str.zfill(13)
+    # Bare IDs get a leading "1" to make up 14 digits, like the real extract
+    return np.where(prefixes == '', '1', prefixes).astype(object) + digits.to_numpy(dtype=object)
+
+
+def generate_orders(rows, postcode_df, seed=0, start=0, start_date=START_DATE, end_date=END_DATE):
+    """``rows`` synthetic orders in the au_report.csv layout (OrderDate, PostalCode, State, OrderID).
+
+    ``start`` numbers the first row, so consecutive chunks get distinct OrderIDs.
+    """
+    rng = np.random.default_rng([seed, start])
+    postcodes, states, weights = postcode_weights(postcode_df)
+    days = pd.date_range(start_date, end_date, freq='D')
+    picks = rng.choice(len(postcodes), size=rows, p=weights)
+    return pd.DataFrame({
+        'OrderDate': days[rng.choice(len(days), size=rows, p=day_weights(days))].strftime('%Y-%m-%d'),
+        'PostalCode': postcodes[picks],
+        'State': states[picks],
+        'OrderID': order_ids(rng, start, rows),
+    })
+
+
+def write_orders(path, rows, postcode_df, seed=0, chunk_rows=CHUNK_ROWS):
+    """Write ``rows`` synthetic orders to a CSV file, ``chunk_rows`` at a time."""
+    with open(path, 'w', newline='') as f:
+        for start in range(0, rows, chunk_rows):
+            chunk = generate_orders(min(chunk_rows, rows - start), postcode_df, seed, start)
+            chunk.to_csv(f, index=False, header=start == 0)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic AU order extract.")
+    parser.add_argument("rows", type=int)
+    parser.add_argument("out")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--postcodes", default=POSTCODES_SOURCE)
+    args = parser.parse_args()
+    write_orders(args.out, args.rows, pd.read_csv(args.postcodes), args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+import os
+import sys
+from io import StringIO
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datastate import SAMPLE_POSTCODES_CSV  # noqa: E402
+from synth import generate_orders  # noqa: E402
+
+
+@pytest.fixture
+def postcode_df():
+    return pd.read_csv(StringIO(SAMPLE_POSTCODES_CSV))
+
+
+@pytest.fixture
+def postcodes_csv(tmp_path):
+    path = tmp_path / "postcodes.csv"
+    path.write_text(SAMPLE_POSTCODES_CSV)
+    return str(path)
+
+
+@pytest.fixture
+def write_orders(postcode_df):
+    """Write or append synthetic orders between two dates, sorted by OrderDate, to a CSV file."""
+    def write(path, rows, start=0, start_date='2024-01-01', end_date='2024-06-30', mode='w'):
+        orders = generate_orders(rows, postcode_df, start=start, start_date=start_date, end_date=end_date)
+        orders = orders.sort_values('OrderDate', kind='stable')
+        orders.to_csv(path, mode=mode, index=False, header=mode == 'w')
+        return orders
+    return write
@@ -0,0 +1,101 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from cube import OrderCube
+from filters import OrderIndex
+from loader import clean_orders, concat_orders
+from pager import SORT_COLUMNS, OrderPager
+from search import MATCH_MODES, OrderIdIndex
+from synth import generate_orders
+
+STATES = [None, ('NSW',), ('VIC', 'ACT'), ('Unknown',), ()]
+DATES = [(None, None), (datetime.date(2024, 3, 1), datetime.date(2024, 7, 15)), (datetime.date(2024, 8, 1), None)]
+
+
+@pytest.fixture
+def batches(postcode_df):
+    """Cleaned orders for January to June, and rows appended after them for July and August.
+
+    The appended rows bring a State and postcode the first rows do not have.
+    """
+    first = generate_orders(3000, postcode_df, start_date='2024-01-01', end_date='2024-06-30')
+    appended = generate_orders(800, postcode_df, start=3000, start_date='2024-07-01', end_date='2024-08-31')
+    appended.loc[appended.index[::7], ['State', 'PostalCode']] = ['ACT', 2600]
+    first, _ = clean_orders(first)
+    appended, _ = clean_orders(appended)
+    return first, appended, concat_orders([first, appended])
+
+
+def postcode_selections(df):
+    keys = sorted(df['PostcodeKey'].unique().tolist())
+    return [None, tuple(keys[:2]), (keys[-1],), (-5,)]
+
+
+def appended_copy(aggregate, appended):
+    copy = aggregate.copy()
+    copy.append(appended)
+    return copy
+
+
+def test_cube_append_matches_rebuild(batches):
+    first, appended, full = batches
+    cube = OrderCube.from_orders(first)
+    before = cube.counts.copy()
+    merged, rebuilt = appended_copy(cube, appended), OrderCube.from_orders(full)
+    pd.testing.assert_frame_equal(cube.counts, before)
+    for states in STATES:
+        for postcode_keys in postcode_selections(full):
+            for start_date, end_date in DATES:
+                views = [c.slice(states, start_date, end_date, postcode_keys) for c in (merged, rebuilt)]
+                assert views[0].total() == views[1].total()
+                for answer in ('state_counts', 'postcode_state_counts', 'postcode_counts', 'monthly_counts',
+                               'state_monthly_counts'):
+                    pd.testing.assert_frame_equal(*(getattr(view, answer)() for view in views), obj=answer)
+                pd.testing.assert_frame_equal(views[0].top_postcodes(5), views[1].top_postcodes(5))
+
+
+def test_order_index_append_matches_rebuild(batches):
+    first, appended, full = batches
+    index = OrderIndex(first)
+    before = index.positions(('NSW',))
+    merged, rebuilt = appended_copy(index, appended), OrderIndex(full)
+    assert len(index) == len(first)
+    np.testing.assert_array_equal(index.positions(('NSW',)), before)
+    for states in STATES:
+        for postcode_keys in postcode_selections(full):
+            for start_date, end_date in DATES:
+                positions = [i.positions(states, postcode_keys, start_date, end_date) for i in (merged, rebuilt)]
+                np.testing.assert_array_equal(*(np.arange(len(full))[p] for p in positions))
+
+
+def test_order_id_index_append_matches_rebuild(batches):
+    first, appended, full = batches
+    index = OrderIdIndex(first)
+    queries = ['', 'a', 'au', '3', '00', 'au20', full['OrderID'].iloc[-1], full['OrderID'].iloc[0][:9]]
+    before = [index.search(query, mode) for query in queries for mode in MATCH_MODES]
+    merged, rebuilt = appended_copy(index, appended), OrderIdIndex(full)
+    for query in queries:
+        for mode in MATCH_MODES:
+            np.testing.assert_array_equal(merged.search(query, mode), rebuilt.search(query, mode))
+    after = [index.search(query, mode) for query in queries for mode in MATCH_MODES]
+    for old, new in zip(before, after):
+        np.testing.assert_array_equal(old, new)
+
+
+def test_pager_append_matches_rebuild(batches):
+    first, appended, full = batches
+    pager = OrderPager(first)
+    before = pager.ordering('before', slice(0, len(first)), 'OrderID').rows.copy()
+    merged, rebuilt = appended_copy(pager, appended), OrderPager(full)
+    assert len(pager) == len(first)
+    np.testing.assert_array_equal(pager.ordering('after', slice(0, len(first)), 'OrderID').rows, before)
+    selections = [slice(0, len(full)), slice(100, 3500), OrderIndex(full).positions(('VIC', 'ACT'))]
+    for column in SORT_COLUMNS:
+        for ascending in (True, False):
+            for key, positions in enumerate(selections):
+                orderings = [p.ordering(key, positions, column, ascending) for p in (merged, rebuilt)]
+                np.testing.assert_array_equal(orderings[0].rows, orderings[1].rows)
+                np.testing.assert_array_equal(orderings[0].ranks, orderings[1].ranks)
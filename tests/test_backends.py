@@ -0,0 +1,42 @@
+import pytest
+
+from backends import SqlStore, duckdb
+from filters import Filters
+from loader import clean_orders
+
+ENGINES = ["sqlite", pytest.param("duckdb", marks=pytest.mark.skipif(duckdb is None, reason="needs duckdb"))]
+EVERYTHING = Filters(None, None, None, None, "", "Contains")
+
+
+@pytest.fixture
+def orders(tmp_path, write_orders):
+    frame = write_orders(str(tmp_path / "orders.csv"), 1000)
+    return clean_orders(frame)[0]
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_stores_in_one_directory_use_their_own_files(engine, tmp_path, orders):
+    first = SqlStore(str(tmp_path), engine)
+    second = SqlStore(str(tmp_path), engine)
+    assert first.path != second.path
+    served = first.load(orders)
+    second.append(second.load(orders.iloc[:600]), orders.iloc[600:])
+    second.load(orders.iloc[:10])
+    assert served.view(EVERYTHING).total() == 1000
+    assert served.table in first.tables(first.connection)
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_reopened_store_reuses_an_unchanged_table(engine, tmp_path, orders):
+    first = SqlStore(str(tmp_path), engine, stamp=lambda: "source-1")
+    table = first.load(orders).table
+    first.claim.close()
+    reopened = SqlStore(str(tmp_path), engine, stamp=lambda: "source-1")
+    assert reopened.path == first.path
+    assert reopened.load(orders).table == table
+    reopened.claim.close()
+    changed = SqlStore(str(tmp_path), engine, stamp=lambda: "source-2")
+    reloaded = changed.load(orders)
+    assert reloaded.table != table
+    assert table not in changed.tables(changed.connection)
+    assert reloaded.view(EVERYTHING).total() == 1000
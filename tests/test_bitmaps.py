@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from bitmaps import ARRAY_LIMIT, CHUNK_SIZE, Bitmap
+
+
+def random_positions(seed):
+    """Sorted unique positions over a few chunks: empty, sparse (array) and dense (bitset) ones."""
+    rng = np.random.default_rng(seed)
+    chunks = []
+    for chunk in range(6):
+        size = rng.choice([0, 1, ARRAY_LIMIT // 4, ARRAY_LIMIT, ARRAY_LIMIT + 1, CHUNK_SIZE // 2, CHUNK_SIZE])
+        chunks.append(chunk * CHUNK_SIZE + rng.choice(CHUNK_SIZE, size, replace=False))
+    return np.unique(np.concatenate(chunks)).astype(np.int64)
+
+
+@pytest.mark.parametrize('seed', range(8))
+def test_bitmap_operations_match_numpy(seed):
+    a, b, c = (random_positions(seed * 3 + i) for i in range(3))
+    ba, bb, bc = (Bitmap.from_positions(p) for p in (a, b, c))
+    np.testing.assert_array_equal(ba.positions(), a)
+    assert len(ba) == len(a)
+    np.testing.assert_array_equal((ba & bb).positions(), np.intersect1d(a, b))
+    np.testing.assert_array_equal((ba | bb).positions(), np.union1d(a, b))
+    np.testing.assert_array_equal(Bitmap.union([ba, bb, bc]).positions(), np.union1d(np.union1d(a, b), c))
+    assert len(ba & bb) == len(np.intersect1d(a, b))
+    rng = np.random.default_rng(seed)
+    for lo, hi in [(0, 6 * CHUNK_SIZE), (CHUNK_SIZE, 2 * CHUNK_SIZE)] + [tuple(sorted(rng.integers(0, 6 * CHUNK_SIZE, 2))) for _ in range(5)]:
+        np.testing.assert_array_equal(ba.clip(lo, hi).positions(), a[(a >= lo) & (a < hi)])
+
+
+def test_empty_bitmaps():
+    empty = Bitmap.from_positions(np.array([], dtype=np.int64))
+    full = Bitmap.from_positions(np.arange(CHUNK_SIZE))
+    assert len(empty) == 0
+    assert len(empty & full) == 0
+    np.testing.assert_array_equal((empty | full).positions(), np.arange(CHUNK_SIZE))
+    assert len(Bitmap.union([])) == 0
+    assert len(full.clip(10, 10)) == 0
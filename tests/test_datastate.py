@@ -0,0 +1,60 @@
+import pytest
+
+import datastate
+from backends import duckdb
+from datastate import build_data_state, query_backend
+from filters import Filters
+from loader import order_snapshot, postcode_snapshot
+
+ENGINES = ["pandas", "sqlite", pytest.param("duckdb", marks=pytest.mark.skipif(duckdb is None, reason="needs duckdb"))]
+EVERYTHING = Filters(None, None, None, None, "", "Contains")
+
+
+def answers(state):
+    backend = query_backend(state)
+    view = backend.view(EVERYTHING)
+    return (
+        view.total(),
+        view.state_counts().to_dict('list'),
+        view.monthly_counts()['OrderCount'].tolist(),
+        len(backend.window(EVERYTHING)),
+        len(backend.rows(EVERYTHING)),
+        backend.date_bounds(),
+    )
+
+
+@pytest.fixture
+def snapshots(tmp_path, monkeypatch, write_orders, postcodes_csv, request):
+    monkeypatch.setattr(datastate, 'QUERY_BACKEND', request.param)
+    monkeypatch.setattr(datastate, 'CACHE_DIR', str(tmp_path / "cache"))
+    source = str(tmp_path / "orders.csv")
+    write_orders(source, 2000)
+    cache_dir = str(tmp_path / "cache")
+    return source, order_snapshot(source, cache_dir), postcode_snapshot(postcodes_csv, cache_dir)
+
+
+@pytest.mark.parametrize('snapshots', ENGINES, indirect=True)
+def test_append_leaves_served_state_unchanged(snapshots, write_orders):
+    source, orders, postcodes = snapshots
+    first = build_data_state(orders, postcodes, None)
+    before = answers(first)
+    assert before[0] == len(first.df) == 2000
+
+    write_orders(source, 300, start=2000, start_date='2024-07-01', end_date='2024-07-31', mode='a')
+    second = build_data_state(orders, postcodes, first)
+    assert len(second.appended) == 300
+    assert answers(first) == before
+    assert answers(second)[0] == len(second.df) == 2300
+
+
+@pytest.mark.parametrize('snapshots', ENGINES, indirect=True)
+def test_full_reload_leaves_served_state_unchanged(snapshots, write_orders):
+    source, orders, postcodes = snapshots
+    first = build_data_state(orders, postcodes, None)
+    before = answers(first)
+
+    write_orders(source, 500, start=5000)
+    second = build_data_state(orders, postcodes, first)
+    assert second.appended is None
+    assert answers(first) == before
+    assert answers(second)[0] == len(second.df) == 500
@@ -0,0 +1,43 @@
+import os
+
+import pytest
+
+from loader import order_snapshot
+
+
+def test_append_ingests_only_the_new_rows(tmp_path, write_orders):
+    source = str(tmp_path / "orders.csv")
+    write_orders(source, 500)
+    snapshot = order_snapshot(source, str(tmp_path / "cache"))
+    snapshot.load()
+    write_orders(source, 50, start=500, start_date='2024-07-01', end_date='2024-07-31', mode='a')
+    df, _ = snapshot.load()
+    assert len(snapshot.appended) == 50
+    assert snapshot.appended_at_end
+    reloaded, _ = order_snapshot(source, str(tmp_path / "cache")).load()
+    assert reloaded.equals(df)
+    assert df['OrderID'].is_unique
+
+
+def test_crash_while_compacting_leaves_the_snapshot_readable(tmp_path, write_orders):
+    source = str(tmp_path / "orders.csv")
+    cache_dir = str(tmp_path / "cache")
+    write_orders(source, 100)
+    snapshot = order_snapshot(source, cache_dir)
+    snapshot.MAX_PARTS = 2
+    snapshot.load()
+    write_orders(source, 10, start=100, start_date='2024-07-01', end_date='2024-07-01', mode='a')
+    snapshot.load()
+    assert len(snapshot.meta["parts"]) == 2
+
+    def crash(meta):
+        raise OSError("disk full")
+    snapshot.write_meta = crash
+    write_orders(source, 10, start=110, start_date='2024-07-02', end_date='2024-07-02', mode='a')
+    with pytest.raises(OSError):
+        snapshot.load()
+
+    df, _ = order_snapshot(source, cache_dir).load()
+    assert len(df) == 120
+    assert df['OrderID'].is_unique
+    assert not [name for name in os.listdir(os.path.join(cache_dir, "orders")) if name.endswith(".tmp")]
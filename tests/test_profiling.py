@@ -0,0 +1,21 @@
+import json
+
+from profiling import RerunProfile
+
+
+def stages(path):
+    with open(path) as f:
+        return [json.loads(line)['stage'] for line in f]
+
+
+def test_fragment_rerun_is_written_on_its_own(tmp_path):
+    path = str(tmp_path / "metrics.jsonl")
+    profile = RerunProfile(True, path)
+    profile.start("Load")
+    assert profile.section("Order Details", lambda: 1) == 1
+    profile.write_metrics()
+    assert stages(path) == ["Load", "Order Details"]
+    # A fragment rerunning alone after the rerun was written gets a line of its own
+    assert profile.section("Order Details", lambda: 2) == 2
+    assert stages(path) == ["Load", "Order Details", "Order Details"]
+    assert [record['stage'] for record in profile.records] == ["Load", "Order Details"]
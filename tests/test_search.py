@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from search import MATCH_MODES, OrderIdIndex
+
+# Mixed case and lengths, including IDs shorter than a trigram and repeated IDs
+IDS = ['AU1001', 'au1002', 'Au-10-03', 'X', 'xy', 'AU1001', 'NZ9', 'ab-AB-ab', 'BAB', '', 'ÄU42', 'zzzzzz']
+
+
+def order_ids(seed, count):
+    rng = np.random.default_rng(seed)
+    alphabet = np.array(list('aAbB01-'))
+    lengths = rng.integers(0, 8, count)
+    return IDS + [''.join(rng.choice(alphabet, length)) for length in lengths]
+
+
+def brute_force(ids, query, mode):
+    key = query.lower()
+    if mode == "Exact":
+        matches = [i for i, value in enumerate(ids) if value.lower() == key]
+    elif mode == "Starts with":
+        matches = [i for i, value in enumerate(ids) if value.lower().startswith(key)]
+    else:
+        matches = [i for i, value in enumerate(ids) if key in value.lower()]
+    return np.array(matches, dtype=np.intp)
+
+
+def queries(ids):
+    # Every substring of up to four characters of some IDs, and a few that match nothing
+    found = {value[i:i + n] for value in ids[:40] for n in range(1, 5) for i in range(len(value))}
+    return sorted(found) + ['', 'q', 'zq', 'au1009', 'AB-AB-AB-AB']
+
+
+def frame(ids):
+    return pd.DataFrame({'OrderID': pd.Series(ids, dtype='str')})
+
+
+@pytest.mark.parametrize('mode', MATCH_MODES)
+def test_search_matches_brute_force(mode):
+    ids = order_ids(0, 500)
+    index = OrderIdIndex(frame(ids))
+    for query in queries(ids):
+        np.testing.assert_array_equal(index.search(query, mode), brute_force(ids, query, mode), err_msg=repr(query))
+
+
+@pytest.mark.parametrize('mode', MATCH_MODES)
+def test_appended_index_matches_rebuilt(mode):
+    ids = order_ids(1, 500)
+    first = OrderIdIndex(frame(ids[:300]))
+    before = {query: first.search(query, mode) for query in queries(ids)}
+    appended = first.copy()
+    appended.append(frame(ids[300:400]))
+    appended.append(frame(ids[400:]))
+    rebuilt = OrderIdIndex(frame(ids))
+    for query in queries(ids):
+        np.testing.assert_array_equal(appended.search(query, mode), rebuilt.search(query, mode), err_msg=repr(query))
+        np.testing.assert_array_equal(first.search(query, mode), before[query], err_msg=repr(query))
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from spatial import KDTree, chord, great_circle, unit_vectors
+
+
+def chords(points, latitude, longitude):
+    """Brute-force chord distances from every point to each query location, as (queries, points)."""
+    queries = unit_vectors(latitude, longitude)
+    return np.sqrt(((queries[:, None, :] - points[None, :, :]) ** 2).sum(axis=2))
+
+
+def random_points(seed, count):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(-44, -10, count), rng.uniform(113, 154, count)
+
+
+@pytest.mark.parametrize('count, leaf_size', [(1, 16), (2, 1), (500, 16), (3000, 4)])
+def test_nearest_matches_brute_force(count, leaf_size):
+    lat, lon = random_points(count, count)
+    tree = KDTree(lat, lon, leaf_size)
+    q_lat, q_lon = random_points(count + 1, 400)
+    ids, km = tree.nearest(q_lat, q_lon)
+    distance = chords(unit_vectors(lat, lon), q_lat, q_lon)
+    rows = np.arange(len(q_lat))
+    np.testing.assert_allclose(km, great_circle(distance.min(axis=1)))
+    np.testing.assert_array_equal(distance[rows, ids], distance.min(axis=1))
+
+
+@pytest.mark.parametrize('radius_km', [0, 1, 25, 300, 3000, 30000])
+def test_within_matches_brute_force(radius_km):
+    lat, lon = random_points(0, 3000)
+    tree = KDTree(lat, lon, 8)
+    points = unit_vectors(lat, lon)
+    for q_lat, q_lon in [(-33.8, 151.2), (lat[5], lon[5]), (-27.5, 120.0), (0.0, 0.0)]:
+        expected = np.flatnonzero(chords(points, [q_lat], [q_lon])[0] <= chord(radius_km))
+        np.testing.assert_array_equal(tree.within(q_lat, q_lon, radius_km), expected)
+
+
+def test_empty_tree():
+    tree = KDTree([], [])
+    assert len(tree) == 0
+    assert len(tree.within(-33.8, 151.2, 100)) == 0
+    ids, km = tree.nearest([-33.8, -37.8], [151.2, 145.0])
+    np.testing.assert_array_equal(ids, [-1, -1])
+    assert np.isinf(km).all()
+    ids, km = tree.nearest([], [])
+    assert len(ids) == len(km) == 0
+
+
+def test_duplicate_points():
+    lat = np.repeat([-33.8, -37.8, -27.5], 40)
+    lon = np.repeat([151.2, 145.0, 153.0], 40)
+    tree = KDTree(lat, lon, 4)
+    np.testing.assert_array_equal(tree.within(-33.8, 151.2, 1), np.arange(40))
+    np.testing.assert_array_equal(tree.within(-35, 148, 600), np.arange(80))
+    ids, km = tree.nearest([-37.8, -27.6], [145.0, 153.0])
+    assert 40 <= ids[0] < 80 and 80 <= ids[1] < 120
+    np.testing.assert_allclose(km[0], 0, atol=1e-6)
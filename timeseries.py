@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+
+GRANULARITIES = ["Daily", "Weekly", "Monthly"]
+
+
+def bin_codes(days, granularity):
+    """Integer bin of each datetime64 value: days, Monday-start weeks or months since 1970."""
+    days = np.asarray(days).astype('datetime64[D]')
+    if granularity == "Monthly":
+        return days.astype('datetime64[M]').astype(np.int64)
+    codes = days.astype(np.int64)
+    if granularity == "Weekly":
+        # 1970-01-01 was a Thursday, so shifting by 3 days puts week boundaries on Mondays
+        return (codes + 3) // 7
+    return codes
+
+
+def bin_starts(codes, granularity):
+    """First day of each bin code, as datetime64[ns]."""
+    if granularity == "Monthly":
+        starts = codes.astype('datetime64[M]')
+    elif granularity == "Weekly":
+        starts = (codes * 7 - 3).astype('datetime64[D]')
+    else:
+        starts = codes.astype('datetime64[D]')
+    return starts.astype('datetime64[ns]')
+
+
+def order_series(day_counts, granularity="Monthly"):
+    """Orders per day, week or month from (Day, OrderCount) rows, with empty bins as zero.
+
+    Rows are binned by integer arithmetic on datetime64 and summed with one
+    ``bincount`` over the dense range of bins, so no per-row Period or string
+    conversion happens. Returns columns Period (bin start) and OrderCount.
+    """
+    if day_counts.empty:
+        return pd.DataFrame({'Period': pd.Series(dtype='datetime64[ns]'), 'OrderCount': pd.Series(dtype=np.int64)})
+    codes = bin_codes(day_counts['Day'].to_numpy(), granularity)
+    first = codes.min()
+    totals = np.bincount(codes - first, weights=day_counts['OrderCount'].to_numpy(dtype=float))
+    return pd.DataFrame({
+        'Period': bin_starts(np.arange(first, first + len(totals)), granularity),
+        'OrderCount': totals.astype(np.int64),
+    })
+
+
+def lttb(x, y, threshold):
+    """Indices of ``threshold`` points chosen by Largest-Triangle-Three-Buckets.
+
+    The first and last points are kept; from each bucket in between the point
+    forming the largest triangle with the previous pick and the next bucket's
+    mean is kept, which preserves peaks and troughs that plain striding drops.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.intp)
+    picked = np.empty(threshold, dtype=np.intp)
+    picked[0], picked[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_hi = edges[i + 2] if i + 2 < len(edges) else n
+        next_x = x[hi:next_hi].mean()
+        next_y = y[hi:next_hi].mean()
+        area = np.abs((x[a] - next_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (next_y - y[a]))
+        a = lo + int(area.argmax())
+        picked[i + 1] = a
+    return picked
+
+
+def downsample(df, x, y, budget, by=None):
+    """At most ``budget`` rows of ``df`` (per ``by`` group) picked by LTTB on columns x and y."""
+    if by is not None:
+        groups = [downsample(group, x, y, budget) for _, group in df.groupby(by, observed=True, sort=False)]
+        return pd.concat(groups) if groups else df
+    if len(df) <= budget:
+        return df
+    x_values = df[x].to_numpy()
+    if np.issubdtype(x_values.dtype, np.datetime64):
+        x_values = x_values.astype('datetime64[ns]').astype(np.int64)
+    elif not np.issubdtype(x_values.dtype, np.number):
+        x_values = np.arange(len(df))
+    return df.iloc[lttb(x_values, df[y].to_numpy(), budget)]
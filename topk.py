@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+
+# Rows the Top tables can show
+TOP_K_CHOICES = [10, 50, 100]
+
+
+def top_positions(values, k):
+    """Positions of the ``k`` largest ``values``, largest first.
+
+    The cut is found with one ``np.partition`` (linear in the number of
+    groups) and only the rows that make it are sorted, so the cost does not
+    depend on ``k``. Ties keep their original order, at the cut as well.
+    """
+    values = np.asarray(values)
+    if len(values) > k:
+        kth = np.partition(values, len(values) - k)[len(values) - k]
+        above = np.flatnonzero(values > kth)
+        ties = np.flatnonzero(values == kth)[:k - len(above)]
+        picked = np.concatenate([above, ties])
+    else:
+        picked = np.arange(len(values))
+    return picked[np.lexsort((picked, -values[picked]))]
+
+
+def top_k(frame, k, column='OrderCount'):
+    """The ``k`` rows of ``frame`` with the largest ``column``, largest first."""
+    return frame.iloc[top_positions(frame[column].to_numpy(), k)].reset_index(drop=True)
+
+
+class CountPartials:
+    """Order counts per (month, State, PostalCode) as one dense array.
+
+    Built from the cube's per-day counts, which are sorted by Day, so each
+    month is a contiguous run of cube rows. The (State, PostalCode) counts
+    for a filter are the sum of the whole months inside its date range plus
+    the cube rows of the part-months at either end, with unselected states
+    and postcodes zeroed; top-K tables are then selected from that small
+    matrix instead of grouping the filtered rows.
+    """
+
+    def __init__(self, counts):
+        self.days = counts['Day'].values
+        self.state_labels = counts['State'].cat.categories
+        self.postal_labels = counts['PostalCode'].cat.categories
+        self.state_codes = counts['State'].cat.codes.to_numpy()
+        self.postal_codes = counts['PostalCode'].cat.codes.to_numpy()
+        self.order_counts = counts['OrderCount'].to_numpy()
+        # PostcodeKey depends only on PostalCode, so one key per category
+        self.keys = np.full(len(self.postal_labels), -1, dtype=np.int16)
+        self.keys[self.postal_codes] = counts['PostcodeKey'].to_numpy()
+        months = self.days.astype('datetime64[M]').astype(np.int64)
+        first = months[0] if len(months) else 0
+        n_months = int(months[-1] - first + 1) if len(months) else 0
+        # Cube rows of month m are month_rows[m]:month_rows[m + 1]
+        self.month_rows = months.searchsorted(np.arange(first, first + n_months + 1))
+        self.totals = self.cells(0, len(self.days), months - first, n_months)
+
+    def cells(self, lo, hi, months=None, n_months=1):
+        """Counts of cube rows lo:hi per (State, PostalCode), or per (month, State, PostalCode)."""
+        shape = (len(self.state_labels), len(self.postal_labels))
+        cell = self.state_codes[lo:hi].astype(np.int64) * shape[1] + self.postal_codes[lo:hi]
+        if months is not None:
+            cell += months * (shape[0] * shape[1])
+        totals = np.bincount(cell, weights=self.order_counts[lo:hi], minlength=n_months * shape[0] * shape[1])
+        if months is not None:
+            return totals.astype(np.int32).reshape((n_months,) + shape)
+        return totals.astype(np.int64).reshape(shape)
+
+    def select(self, states=None, start_date=None, end_date=None, postcode_keys=None):
+        """SelectedCounts for a filter: any of ``states`` and ``postcode_keys`` (None for all), inclusive dates."""
+        lo = self.days.searchsorted(pd.Timestamp(start_date).to_datetime64()) if start_date is not None else 0
+        hi = self.days.searchsorted(pd.Timestamp(end_date).to_datetime64(), side='right') if end_date is not None else len(self.days)
+        # Months whose rows all fall in lo:hi come from the partials, the rest row by row
+        first = self.month_rows[:-1].searchsorted(lo)
+        last = self.month_rows[1:].searchsorted(hi, side='right')
+        if first < last:
+            totals = self.totals[first:last].sum(axis=0, dtype=np.int64)
+            totals += self.cells(lo, self.month_rows[first])
+            totals += self.cells(self.month_rows[last], hi)
+        else:
+            totals = self.cells(lo, hi)
+        if states is not None:
+            totals[~self.state_labels.isin(states)] = 0
+        if postcode_keys is not None:
+            totals[:, ~np.isin(self.keys, postcode_keys)] = 0
+        return SelectedCounts(self, totals)
+
+
+class SelectedCounts:
+    """The (State, PostalCode) order counts of one filter selection, from CountPartials."""
+
+    def __init__(self, partials, totals):
+        self.partials = partials
+        self.totals = totals
+
+    def postcode_state_counts(self):
+        """(PostalCode, State, OrderCount) for every non-empty cell, in PostalCode then State order."""
+        return self.frame(np.flatnonzero(self.totals.T.ravel()))
+
+    def top_postcodes(self, k):
+        """The ``k`` largest (PostalCode, State) cells, largest first."""
+        flat = self.totals.T.ravel()
+        cells = np.flatnonzero(flat)
+        return self.frame(cells[top_positions(flat[cells], k)])
+
+    def postcode_counts(self):
+        totals = self.totals.sum(axis=0)
+        codes = np.flatnonzero(totals)
+        return pd.DataFrame({
+            'PostalCode': pd.Categorical.from_codes(codes, dtype=pd.CategoricalDtype(self.partials.postal_labels)),
+            'PostcodeKey': self.partials.keys[codes],
+            'OrderCount': totals[codes],
+        })
+
+    def frame(self, cells):
+        """Rows for flat indexes into the (PostalCode, State) transposed matrix."""
+        postal, state = np.divmod(cells, len(self.partials.state_labels))
+        return pd.DataFrame({
+            'PostalCode': pd.Categorical.from_codes(postal, dtype=pd.CategoricalDtype(self.partials.postal_labels)),
+            'State': pd.Categorical.from_codes(state, dtype=pd.CategoricalDtype(self.partials.state_labels)),
+            'OrderCount': self.totals.T.ravel()[cells],
+        })